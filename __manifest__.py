@@ -1,6 +1,6 @@
 {
     'name': 'Shopping list management system',
-    'version': '16.0.1.0.0',
+    'version': '16.0.1.3.0',
     'category': 'Productivity',
     'summary': 'Integrated system for managing shopping lists and budgets',
     'description': """
@@ -19,18 +19,26 @@
     'author': 'sara mohammed',
     'website': 'https://www.sara.com',
     'depends': ['base', 'web', 'mail'],
+    'external_dependencies': {
+        'python': ['numpy'],
+    },
 
     'data': [
         'security/shopping_list_security.xml',
         'security/ir.model.access.csv',
 
         'data/shopping_list_data.xml',
+        'data/ir_cron_data.xml',
 
         'views/shopping_list_views.xml',
         'views/shopping_item_views.xml',
         'views/category_views.xml',
         'views/budget_views.xml',
         'views/dashboard_views.xml',
+        'views/import_job_views.xml',
+        'views/price_change_views.xml',
+        'views/list_template_views.xml',
+        'views/report_job_views.xml',
         # 'views/dashboard_templates.xml',
 
 
@@ -44,6 +52,7 @@
         'wizards/copy_shopping_list_views.xml',
         'wizards/update_prices_views.xml',
         'wizards/budget_report_views.xml',
+        'wizards/category_restructure_wizard_views.xml',
     ],
 
     'images': ['static/description/groceries.png'],
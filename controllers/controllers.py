@@ -1,102 +1,114 @@
 from odoo import models, fields, api
 from odoo import http
-from odoo.http import request
+from odoo.http import request, content_disposition, Response
+from odoo.exceptions import UserError
+from werkzeug.exceptions import BadRequest
+from odoo.modules.registry import Registry
 import json
+import zlib
 from datetime import datetime, timedelta
+from ..models.analytics_engine import TREND_INTERVALS
 
 
 class ShoppingDashboard(http.Controller):
 
     @http.route('/shopping/dashboard/data', type='json', auth='user')
-    def get_dashboard_data(self):
+    def get_dashboard_data(self, etag=None):
         """الحصول على بيانات لوحة التحكم"""
-        ShoppingList = request.env['shopping.list']
-        ShoppingItem = request.env['shopping.item']
-        ShoppingBudget = request.env['shopping.budget']
+        # إرجاع اللقطة المخزنة أو not_modified إذا لم تتغير البيانات منذ آخر طلب
+        return request.env['shopping.dashboard'].get_dashboard_snapshot(etag)
 
-        # الإحصائيات الأساسية
-        total_lists = ShoppingList.search_count([('user_id', '=', request.env.uid)])
-        bought_items = ShoppingItem.search_count([
-            ('user_id', '=', request.env.uid),
-            ('bought', '=', True)
-        ])
+    @http.route('/shopping/item/suggest', type='json', auth='user')
+    def suggest_items(self, term='', limit=8):
+        """اقتراح أسماء العناصر أثناء الكتابة"""
+        return request.env['shopping.item.suggest'].suggest(term, min(int(limit), 50))
 
-        # حساب الميزانية المستخدمة
-        bought_items_records = ShoppingItem.search([
-            ('user_id', '=', request.env.uid),
-            ('bought', '=', True)
-        ])
-        used_budget = sum(bought_items_records.mapped('total_actual'))
-
-        # متوسط الإنجاز
-        user_lists = ShoppingList.search([('user_id', '=', request.env.uid)])
-        avg_completion = sum(user_lists.mapped('completion_rate')) / len(user_lists) if user_lists else 0
-
-        # القوائم الحديثة
-        recent_lists = ShoppingList.search([
-            ('user_id', '=', request.env.uid)
-        ], limit=5, order='create_date desc')
-
-        recent_lists_data = []
-        for lst in recent_lists:
-            recent_lists_data.append({
-                'name': lst.name,
-                'state': lst.state,
-                'completion_rate': lst.completion_rate
-            })
-
-        # إحصائيات الميزانية
-        current_budgets = ShoppingBudget.search([
+    @http.route('/shopping/analytics/trends', type='json', auth='user')
+    def get_trends(self, start_date, end_date, interval='week', category_id=None):
+        """سلاسل المصروف والإنجاز للمستخدم الحالي مقارنة بالمدة السابقة"""
+        if not isinstance(interval, str) or interval not in TREND_INTERVALS:
+            raise UserError("Unknown trend interval '{}'. Use one of: {}.".format(
+                interval, ', '.join(TREND_INTERVALS)))
+        try:
+            start_date, end_date = fields.Date.to_date(start_date), fields.Date.to_date(end_date)
+        except ValueError:
+            raise UserError("Dates must use the YYYY-MM-DD format.")
+        if not start_date or not end_date or start_date > end_date:
+            raise UserError("The start date must be before the end date.")
+        return request.env['shopping.analytics.engine'].time_series(
+            start_date, end_date, interval,
+            category_id=int(category_id) if category_id else None, user_id=request.env.uid)
+
+    @http.route('/shopping/budget/burndown', type='json', auth='user')
+    def get_budget_burndown(self):
+        """منحنيات استهلاك الميزانيات الحالية للمستخدم"""
+        today = fields.Date.today()
+        budgets = request.env['shopping.budget'].search([
             ('user_id', '=', request.env.uid),
-            ('start_date', '<=', fields.Date.today()),
-            ('end_date', '>=', fields.Date.today())
-        ])
-
-        total_budget = sum(current_budgets.mapped('amount'))
-        budget_used = sum(current_budgets.mapped('actual_spent'))
-        budget_remaining = total_budget - budget_used
-
-        # العناصر حسب الأولوية
-        priority_stats = {
-            'high': ShoppingItem.search_count([
-                ('list_id.user_id', '=', request.env.uid),
-                ('priority', '=', 'high')
-            ]),
-            'medium': ShoppingItem.search_count([
-                ('list_id.user_id', '=', request.env.uid),
-                ('priority', '=', 'medium')
-            ]),
-            'low': ShoppingItem.search_count([
-                ('list_id.user_id', '=', request.env.uid),
-                ('priority', '=', 'low')
-            ])
-        }
-
-        # العناصر حسب الفئة
-        category_stats = {}
-        categories = request.env['shopping.category'].search([])
-        for category in categories:
-            count = ShoppingItem.search_count([
-                ('list_id.user_id', '=', request.env.uid),
-                ('category_id', '=', category.id)
-            ])
-            if count > 0:
-                category_stats[category.name] = count
-
-        return {
-            'total_lists': total_lists,
-            'bought_items': bought_items,
-            'used_budget': used_budget,
-            'avg_completion': avg_completion,
-            'recent_lists': [{
-                'name': lst.name,
-                'state': lst.state,
-                'completion_rate': lst.completion_rate
-            } for lst in recent_lists]
-        }
+            ('start_date', '<=', today),
+            ('end_date', '>=', today),
+        ], order='start_date, id')
+        return budgets._get_burndown(today)
 
     @http.route('/shopping/dashboard', type='http', auth='user', website=True)
     def shopping_dashboard(self, **kwargs):
         """عرض لوحة التحكم"""
         # يمكنك استخدام هذا المسار إذا أردت عرض لوحة التحكم في واجهة الموقع
-        return request.render('shopping_list.shopping_dashboard')
\ No newline at end of file
+        return request.render('shopping_list.shopping_dashboard')
+
+class ShoppingExport(http.Controller):
+
+    @http.route('/shopping/export', type='http', auth='user', methods=['GET'])
+    def export_items(self, list_id=None, include_bought='1', compression='none', split_by_list='0', **kwargs):
+        """تحميل العناصر كملف CSV متدفق (اختياريًا مضغوط أو ملف لكل قائمة)"""
+        if list_id and not list_id.isdigit():
+            raise BadRequest("list_id must be a list identifier.")
+        Wizard = request.env['shopping.import.export.wizard']
+        domain = Wizard._get_export_domain(int(list_id) if list_id else None, include_bought == '1')
+        timestamp = fields.Datetime.now().strftime('%Y%m%d_%H%M%S')
+
+        if split_by_list == '1':
+            filename = 'shopping_export_{}.zip'.format(timestamp)
+            content_type = 'application/zip'
+            method = '_iter_export_zip'
+        elif compression == 'gzip':
+            filename = 'shopping_export_{}.csv.gz'.format(timestamp)
+            content_type = 'application/gzip'
+            method = '_iter_export_csv'
+        else:
+            filename = 'shopping_export_{}.csv'.format(timestamp)
+            content_type = 'text/csv; charset=utf-8'
+            method = '_iter_export_csv'
+
+        chunks = self._stream_from_new_cursor(method, domain)
+        if compression == 'gzip' and split_by_list != '1':
+            chunks = _gzip_chunks(chunks)
+
+        headers = [
+            ('Content-Type', content_type),
+            ('Content-Disposition', content_disposition(filename)),
+        ]
+        return Response(chunks, headers=headers, direct_passthrough=True)
+
+    def _stream_from_new_cursor(self, method, domain):
+        """توليد الأجزاء بمؤشر قاعدة بيانات خاص لأن مؤشر الطلب يُغلق قبل إرسال الاستجابة"""
+        dbname = request.env.cr.dbname
+        uid = request.env.uid
+        context = dict(request.env.context)
+
+        def generate():
+            with Registry(dbname).cursor() as cr:
+                env = api.Environment(cr, uid, context)
+                yield from getattr(env['shopping.import.export.wizard'], method)(domain)
+
+        return generate()
+
+
+def _gzip_chunks(chunks):
+    """ضغط الأجزاء بصيغة gzip أثناء التدفق"""
+    compressor = zlib.compressobj(wbits=zlib.MAX_WBITS | 16)
+    for chunk in chunks:
+        data = compressor.compress(chunk)
+        if data:
+            yield data
+    yield compressor.flush()
@@ -0,0 +1,9 @@
+from odoo import api, SUPERUSER_ID
+
+
+def migrate(cr, version):
+    """تعبئة عدادات القوائم المخزنة لقواعد البيانات الموجودة"""
+    if not version:
+        return
+    env = api.Environment(cr, SUPERUSER_ID, {})
+    env['shopping.list'].with_context(active_test=False).search([])._recompute_item_counters()
@@ -0,0 +1,12 @@
+def migrate(cr, version):
+    """إنشاء عمود مالك العنصر وتعبئته بتحديث واحد بدل الحساب عبر ORM لكل عنصر"""
+    if not version:
+        return
+    cr.execute("ALTER TABLE shopping_item ADD COLUMN IF NOT EXISTS user_id int4")
+    cr.execute("""
+        UPDATE shopping_item i
+           SET user_id = l.user_id
+          FROM shopping_list l
+         WHERE l.id = i.list_id
+           AND i.user_id IS DISTINCT FROM l.user_id
+    """)
@@ -0,0 +1,14 @@
+def migrate(cr, version):
+    """إنشاء عمود ترتيب الأولوية وتعبئته بتحديث واحد بدل الحساب عبر ORM لكل عنصر"""
+    if not version:
+        return
+    cr.execute("ALTER TABLE shopping_item ADD COLUMN IF NOT EXISTS priority_rank int4")
+    cr.execute("""
+        UPDATE shopping_item
+           SET priority_rank = CASE priority
+                                   WHEN 'high' THEN 0
+                                   WHEN 'medium' THEN 1
+                                   WHEN 'low' THEN 2
+                                   ELSE 3
+                               END
+    """)
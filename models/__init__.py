@@ -2,4 +2,13 @@ from . import category
 from . import shopping_item
 from . import shopping_list
 from . import budget
+from . import dashboard
+from . import import_job
+from . import price_change
+from . import list_template
+from . import item_suggest
+from . import analytics_engine
+from . import report_cache
+from . import report_job
+from . import budget_forecast
 from . import wizard
\ No newline at end of file
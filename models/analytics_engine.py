@@ -0,0 +1,234 @@
+from odoo import models, api
+from datetime import timedelta
+from dateutil.relativedelta import relativedelta
+import numpy as np
+
+
+# التعبيرات المتاحة للتجميع؛ تاريخ العنصر هو تاريخ الشراء للمشترى وتاريخ الإنشاء للمعلق
+ITEM_DATE_SQL = "CASE WHEN i.bought THEN i.date_bought ELSE i.create_date END"
+ANALYTICS_GROUPINGS = {
+    'category': "i.category_id",
+    'month': "date_trunc('month', {})::date".format(ITEM_DATE_SQL),
+    'week': "date_trunc('week', {})::date".format(ITEM_DATE_SQL),
+    'user': "i.user_id",
+    'store': "nullif(trim(i.store), '')",
+}
+
+# طول كل فترة في السلاسل الزمنية
+TREND_INTERVALS = {
+    'day': relativedelta(days=1),
+    'week': relativedelta(weeks=1),
+    'month': relativedelta(months=1),
+}
+# عدد الفترات في المتوسط المتحرك
+TREND_MOVING_AVERAGE_WINDOW = 3
+
+
+class ShoppingAnalyticsEngine(models.AbstractModel):
+    _name = 'shopping.analytics.engine'
+    _description = 'Shopping analytics aggregation engine'
+
+    @api.model
+    def aggregate(self, start_date, end_date, groupings=(), category_id=None, user_id=None,
+                  include_bought=True, include_pending=True):
+        """تجميع إحصائيات العناصر في قاعدة البيانات باستعلام واحد
+
+        يتم حساب المجموع الكلي وكل تجميع مطلوب كمجموعة مستقلة في GROUPING SETS.
+        يرجع {'totals': {...}, 'groups': {اسم التجميع: [{'key', 'label', ...}]}}
+        """
+        groupings = [grouping for grouping in ANALYTICS_GROUPINGS if grouping in groupings]
+        empty = self._make_stats(0, 0, 0.0, 0.0)
+        if not (include_bought or include_pending):
+            return {'totals': empty, 'groups': {grouping: [] for grouping in groupings}}
+        where, params = self._get_item_where(start_date, end_date, category_id, user_id, include_bought, include_pending)
+
+        keys = [ANALYTICS_GROUPINGS[grouping] for grouping in groupings]
+        select_keys = "".join(
+            "GROUPING({0}), {0}, ".format(key) for key in keys)
+        grouping_sets = ", ".join(["()"] + ["({})".format(key) for key in keys])
+
+        self.env['shopping.item'].flush_model([
+            'bought', 'date_bought', 'quantity', 'estimated_price', 'actual_price', 'category_id', 'store', 'user_id',
+        ])
+        self.env.cr.execute("""
+            SELECT {select_keys}
+                   count(*),
+                   count(*) FILTER (WHERE i.bought),
+                   coalesce(sum(i.quantity * coalesce(i.estimated_price, 0)), 0),
+                   coalesce(sum(i.quantity * coalesce(i.actual_price, 0)) FILTER (WHERE i.bought), 0)
+              FROM shopping_item i
+             WHERE {where}
+          GROUP BY GROUPING SETS ({grouping_sets})
+        """.format(select_keys=select_keys, where=where, grouping_sets=grouping_sets), params)
+
+        totals = empty
+        groups = {grouping: [] for grouping in groupings}
+        for row in self.env.cr.fetchall():
+            stats = self._make_stats(*row[2 * len(keys):])
+            for position, grouping in enumerate(groupings):
+                if not row[2 * position]:
+                    groups[grouping].append(dict(stats, key=row[2 * position + 1]))
+                    break
+            else:
+                totals = stats
+
+        self._label_groups(groups)
+        return {'totals': totals, 'groups': groups}
+
+    @api.model
+    def _get_item_where(self, start_date, end_date, category_id=None, user_id=None,
+                        include_bought=True, include_pending=True):
+        """شرط WHERE ومعاملاته لعناصر الفترة"""
+        # فلترة كل حالة على عمود تاريخها المفهرس بدل تعبير التاريخ المحسوب
+        ranges = []
+        if include_bought:
+            ranges.append("(i.bought AND i.date_bought >= %(start)s AND i.date_bought < %(end)s::date + 1)")
+        if include_pending:
+            ranges.append("(i.bought IS NOT TRUE AND i.create_date >= %(start)s AND i.create_date < %(end)s::date + 1)")
+        where = ["({})".format(" OR ".join(ranges) or "FALSE")]
+        if category_id:
+            where.append("i.category_id = %(category_id)s")
+        if user_id:
+            where.append("i.user_id = %(user_id)s")
+        return " AND ".join(where), {
+            'start': start_date,
+            'end': end_date,
+            'category_id': category_id,
+            'user_id': user_id,
+        }
+
+    @api.model
+    def time_series(self, start_date, end_date, interval='week', category_id=None, user_id=None,
+                    include_bought=True, include_pending=True):
+        """سلاسل المصروف والإنجاز لكل فترة للمدة الحالية والمدة السابقة المساوية لها في استعلام واحد
+
+        الفروق والمتوسطات المتحركة ونسب النمو تُحسب بعمليات NumPy على مصفوفات الفترات.
+        """
+        step = TREND_INTERVALS[interval]
+        buckets = self._get_bucket_starts(interval, start_date, end_date)
+        previous_buckets = [bucket - step * len(buckets) for bucket in buckets]
+        positions = {bucket: (0, index) for index, bucket in enumerate(buckets)}
+        positions.update((bucket, (1, index)) for index, bucket in enumerate(previous_buckets))
+
+        where, params = self._get_item_where(
+            previous_buckets[0], end_date, category_id, user_id, include_bought, include_pending)
+        params['interval'] = interval
+        self.env['shopping.item'].flush_model([
+            'bought', 'date_bought', 'quantity', 'estimated_price', 'actual_price', 'category_id', 'user_id',
+        ])
+        self.env.cr.execute("""
+            SELECT date_trunc(%(interval)s, {item_date})::date,
+                   count(*),
+                   count(*) FILTER (WHERE i.bought),
+                   coalesce(sum(i.quantity * coalesce(i.estimated_price, 0)), 0),
+                   coalesce(sum(i.quantity * coalesce(i.actual_price, 0)) FILTER (WHERE i.bought), 0)
+              FROM shopping_item i
+             WHERE {where}
+          GROUP BY 1
+        """.format(item_date=ITEM_DATE_SQL, where=where), params)
+
+        # المحور الأول: المدة (الحالية، السابقة)، الثاني: المقياس، الثالث: الفترة
+        values = np.zeros((2, 4, len(buckets)))
+        for bucket, *row in self.env.cr.fetchall():
+            if bucket in positions:
+                period, index = positions[bucket]
+                values[period, :, index] = row
+
+        current = self._series_metrics(values[0])
+        previous = self._series_metrics(values[1])
+        spent_growth, spent_growth_valid = self._growth(current['spent'], previous['spent'])
+        total_growth, total_growth_valid = self._growth(current['spent'].sum(), previous['spent'].sum())
+        return {
+            'interval': interval,
+            'labels': [bucket.isoformat() for bucket in buckets],
+            'previous_labels': [bucket.isoformat() for bucket in previous_buckets],
+            'current': {name: series.tolist() for name, series in current.items()},
+            'previous': {name: series.tolist() for name, series in previous.items()},
+            'delta': {
+                'spent': (current['spent'] - previous['spent']).tolist(),
+                'completion': (current['completion'] - previous['completion']).tolist(),
+            },
+            'growth': {
+                'spent': [growth if valid else None
+                          for growth, valid in zip(spent_growth.tolist(), spent_growth_valid.tolist())],
+            },
+            'totals': {
+                'current_spent': float(current['spent'].sum()),
+                'previous_spent': float(previous['spent'].sum()),
+                'growth': float(total_growth) if total_growth_valid else None,
+            },
+        }
+
+    @api.model
+    def _get_bucket_starts(self, interval, start_date, end_date):
+        """بدايات الفترات التي تغطي المدة"""
+        if interval == 'week':
+            bucket = start_date - timedelta(days=start_date.weekday())
+        elif interval == 'month':
+            bucket = start_date.replace(day=1)
+        else:
+            bucket = start_date
+        buckets = []
+        while bucket <= end_date:
+            buckets.append(bucket)
+            bucket += TREND_INTERVALS[interval]
+        return buckets or [bucket]
+
+    @api.model
+    def _series_metrics(self, values, window=TREND_MOVING_AVERAGE_WINDOW):
+        """المقاييس المشتقة لسلسلة واحدة: نسبة الإنجاز والمجموع التراكمي والمتوسط المتحرك"""
+        count, bought, estimated, spent = values
+        cumulative = np.cumsum(spent)
+        # مجموع آخر window فترات = المجموع التراكمي ناقص المجموع التراكمي قبل window فترات
+        shifted = np.concatenate((np.zeros(window), cumulative))[:len(spent)]
+        periods = np.minimum(np.arange(1, len(spent) + 1), window)
+        return {
+            'items': count,
+            'bought': bought,
+            'estimated': estimated,
+            'spent': spent,
+            'completion': np.divide(bought * 100, count, out=np.zeros_like(count), where=count > 0),
+            'cumulative': cumulative,
+            'moving_average': (cumulative - shifted) / periods,
+        }
+
+    @api.model
+    def _growth(self, current, previous):
+        """نسبة النمو مع قناع للقيم الصالحة (المدة السابقة غير صفرية)"""
+        current = np.asarray(current, dtype=float)
+        previous = np.asarray(previous, dtype=float)
+        valid = previous != 0
+        growth = np.divide((current - previous) * 100, previous, out=np.zeros_like(current), where=valid)
+        return growth, valid
+
+    @api.model
+    def _make_stats(self, count, bought, estimated, spent):
+        return {
+            'count': count,
+            'bought_count': bought,
+            'pending_count': count - bought,
+            'total_estimated': estimated,
+            'total_spent': spent,
+            'completion_rate': (bought / count * 100) if count else 0.0,
+        }
+
+    @api.model
+    def _label_groups(self, groups):
+        """إضافة أسماء العرض لمفاتيح المجموعات مع ترتيب ثابت"""
+        models_by_grouping = {'category': 'shopping.category', 'user': 'res.users'}
+        for grouping, rows in groups.items():
+            if grouping in models_by_grouping:
+                records = self.env[models_by_grouping[grouping]].browse([row['key'] for row in rows if row['key']])
+                names = {record.id: record.display_name for record in records}
+                for row in rows:
+                    row['label'] = names.get(row['key']) or ('Unrated' if grouping == 'category' else 'Unassigned')
+                rows.sort(key=lambda row: -row['total_spent'])
+            elif grouping == 'store':
+                for row in rows:
+                    row['label'] = row['key'] or 'No store'
+                rows.sort(key=lambda row: -row['total_spent'])
+            else:
+                for row in rows:
+                    row['key'] = row['key'] and row['key'].isoformat()
+                    row['label'] = row['key'] or ''
+                rows.sort(key=lambda row: row['key'] or '')
@@ -1,9 +1,28 @@
 from odoo import models, fields, api
-from datetime import datetime , timedelta
+from odoo.exceptions import ValidationError
+from collections import defaultdict
+from datetime import timedelta
+from dateutil.relativedelta import relativedelta
+import numpy as np
+
+
+# طول كل فترة ميزانية
+BUDGET_PERIODS = {
+    'daily': relativedelta(days=1),
+    'weekly': relativedelta(weeks=1),
+    'monthly': relativedelta(months=1),
+    'yearly': relativedelta(years=1),
+}
+# أنواع الفترات التي تُقترح لها ميزانيات جديدة من المصروف الفعلي،
+# باقي الأنواع يتم ترحيل ميزانيات المستخدم الموجودة فيها فقط
+BUDGET_SEED_PERIODS = ('monthly',)
+# عدد الميزانيات المنشأة في كل عملية create أثناء التوليد التلقائي
+BUDGET_BATCH_SIZE = 1000
 
 
 class ShoppingBudget(models.Model):
     _name = 'shopping.budget'
+    _inherit = ['mail.thread']
     _description = 'Shopping budget'
 
     name = fields.Char(string='budget name', required=True)
@@ -16,49 +35,387 @@ class ShoppingBudget(models.Model):
     ], string='period', required=True)
 
     amount = fields.Float(string='Amount', required=True)
-    start_date = fields.Date(string='start date', required=True)
-    end_date = fields.Date(string=' end date', required=True)
+    start_date = fields.Date(string='start date', required=True, index=True)
+    end_date = fields.Date(string=' end date', required=True, index=True)
 
     category_id = fields.Many2one('shopping.category', string='Category')
-    actual_spent = fields.Float(string='Actual Spent', compute='_compute_actual_spent')
-    remaining = fields.Float(string='Remaning', compute='_compute_actual_spent')
-    usage_percentage = fields.Float(string='usage percentage', compute='_compute_actual_spent')
+    actual_spent = fields.Float(string='Actual Spent', compute='_compute_actual_spent', store=True)
+    remaining = fields.Float(string='Remaning', compute='_compute_actual_spent', store=True)
+    usage_percentage = fields.Float(string='usage percentage', compute='_compute_actual_spent', store=True)
+    alert_thresholds = fields.Char(string='Alert thresholds (%)', default='80,100',
+                                   help="Comma separated usage percentages that trigger a notification.")
+    alert_ids = fields.One2many('shopping.budget.alert', 'budget_id', string='Alerts')
 
-    @api.depends('amount', 'category_id', 'start_date', 'end_date')
+    @api.depends('amount', 'category_id', 'start_date', 'end_date', 'user_id')
     def _compute_actual_spent(self):
+        spent = self._get_spent_by_budget()
         for record in self:
-            domain = [
-                ('bought', '=', True),
-                ('date_bought', '>=', record.start_date),
-                ('date_bought', '<=', record.end_date)
-            ]
-            if record.category_id:
-                domain.append(('category_id', '=', record.category_id.id))
-
-            items = self.env['shopping.item'].search(domain)
-            record.actual_spent = sum(items.mapped('total_actual'))
+            record.actual_spent = spent.get(record.id, 0.0)
             record.remaining = record.amount - record.actual_spent
             record.usage_percentage = (record.actual_spent / record.amount * 100) if record.amount > 0 else 0
 
+    def _get_spent_by_budget(self):
+        """حساب المصروف لكل الميزانيات في استعلام مجمع واحد"""
+        budgets = [budget for budget in self if budget.start_date and budget.end_date]
+        if not budgets:
+            return {}
+        self.env['shopping.item'].flush_model([
+            'bought', 'date_bought', 'quantity', 'actual_price', 'category_id', 'user_id',
+        ])
+        # يتم تمرير قيم الميزانيات كمصفوفات لتعمل أيضًا مع السجلات غير المحفوظة
+        self.env.cr.execute("""
+            SELECT b.idx, coalesce(sum(i.quantity * coalesce(i.actual_price, 0)), 0)
+              FROM unnest(%s::int[], %s::date[], %s::date[], %s::int[], %s::int[])
+                   AS b(idx, start_date, end_date, category_id, user_id)
+              JOIN shopping_item i
+                ON i.bought
+               AND i.date_bought >= b.start_date
+               AND i.date_bought < b.end_date + 1
+               AND (b.category_id IS NULL OR i.category_id = b.category_id)
+             WHERE b.user_id IS NULL OR i.user_id = b.user_id
+          GROUP BY b.idx
+        """, [
+            list(range(len(budgets))),
+            [budget.start_date for budget in budgets],
+            [budget.end_date for budget in budgets],
+            [budget.category_id.id or None for budget in budgets],
+            [budget.user_id.id or None for budget in budgets],
+        ])
+        return {budgets[idx].id: spent for idx, spent in self.env.cr.fetchall()}
+
+    def _get_burndown(self, as_of=None):
+        """منحنى الاستهلاك اليومي لكل الميزانيات من تجميع واحد (ميزانية، يوم)
+
+        لكل ميزانية: المصروف التراكمي مقابل الخطة الموزعة بالتساوي على أيام الفترة،
+        والفرق حتى اليوم، وتاريخ التجاوز الفعلي أو المتوقع بمعدل الصرف الحالي.
+        """
+        budgets = self.filtered(lambda budget: budget.start_date and budget.end_date
+                                and budget.end_date >= budget.start_date)
+        if not budgets:
+            return []
+        as_of = as_of or fields.Date.today()
+        self.env['shopping.item'].flush_model([
+            'bought', 'date_bought', 'quantity', 'actual_price', 'category_id', 'user_id',
+        ])
+        budgets.flush_recordset(['amount', 'start_date', 'end_date', 'category_id', 'user_id'])
+        self.env.cr.execute("""
+            SELECT b.id, i.date_bought::date - b.start_date, sum(i.quantity * coalesce(i.actual_price, 0))
+              FROM shopping_budget b
+              JOIN shopping_item i
+                ON i.bought
+               AND i.date_bought >= b.start_date
+               AND i.date_bought < b.end_date + 1
+               AND (b.category_id IS NULL OR i.category_id = b.category_id)
+             WHERE b.id IN %s
+               AND (b.user_id IS NULL OR i.user_id = b.user_id)
+          GROUP BY 1, 2
+        """, [tuple(budgets.ids)])
+
+        # مصفوفة (ميزانية × يوم) بطول أطول فترة
+        positions = {budget_id: index for index, budget_id in enumerate(budgets.ids)}
+        days = np.array([(budget.end_date - budget.start_date).days + 1 for budget in budgets])
+        amounts = np.array(budgets.mapped('amount'), dtype=float)
+        daily = np.zeros((len(budgets), days.max()))
+        rows = self.env.cr.fetchall()
+        if rows:
+            budget_ids, day_index, spent = zip(*rows)
+            daily[[positions[budget_id] for budget_id in budget_ids], list(day_index)] = spent
+
+        day_numbers = np.arange(1, days.max() + 1)
+        cumulative = np.cumsum(daily, axis=1)
+        plan = amounts[:, None] * np.minimum(day_numbers, days[:, None]) / days[:, None]
+        elapsed = np.clip([(as_of - budget.start_date).days + 1 for budget in budgets], 0, days)
+        last = np.maximum(elapsed - 1, 0)
+        rows_index = np.arange(len(budgets))
+        spent_to_date = np.where(elapsed > 0, cumulative[rows_index, last], 0.0)
+        planned_to_date = np.where(elapsed > 0, plan[rows_index, last], 0.0)
+        rate = np.divide(spent_to_date, elapsed, out=np.zeros_like(spent_to_date), where=elapsed > 0)
+
+        # أول يوم تجاوز فيه المصروف التراكمي الميزانية، أو اليوم المتوقع بمعدل الصرف الحالي
+        over = (cumulative > amounts[:, None]) & (day_numbers <= elapsed[:, None])
+        overrun_day = np.where(over.any(axis=1), over.argmax(axis=1), -1)
+        projected_day = np.maximum(
+            np.ceil(np.divide(amounts, rate, out=np.full_like(rate, np.inf), where=rate > 0)) - 1, 0)
+
+        result = []
+        for index, budget in enumerate(budgets):
+            length = days[index]
+            if overrun_day[index] >= 0:
+                projected_overrun = budget.start_date + timedelta(days=int(overrun_day[index]))
+            elif projected_day[index] < length:
+                projected_overrun = budget.start_date + timedelta(days=int(projected_day[index]))
+            else:
+                projected_overrun = None
+            result.append({
+                'budget_id': budget.id,
+                'name': budget.name,
+                'amount': budget.amount,
+                'start_date': budget.start_date.isoformat(),
+                'end_date': budget.end_date.isoformat(),
+                'labels': [(budget.start_date + timedelta(days=day)).isoformat() for day in range(length)],
+                'actual': cumulative[index, :elapsed[index]].tolist(),
+                'plan': plan[index, :length].tolist(),
+                'spent_to_date': float(spent_to_date[index]),
+                'planned_to_date': float(planned_to_date[index]),
+                'variance': float(spent_to_date[index] - planned_to_date[index]),
+                'projected_total': float(rate[index] * length),
+                'overrun': bool(overrun_day[index] >= 0),
+                'projected_overrun_date': projected_overrun and projected_overrun.isoformat(),
+            })
+        return result
+
+    @api.model
+    def _find_covering_budgets(self, purchases):
+        """البحث عن الميزانيات التي يغطي نطاقها وفئتها عمليات الشراء
+
+        purchases: مجموعة من (تاريخ الشراء، الفئة، المستخدم)
+        """
+        purchases = list({purchase for purchase in purchases if purchase[0]})
+        if not purchases:
+            return self.browse()
+        self.flush_model(['start_date', 'end_date', 'category_id', 'user_id'])
+        self.env.cr.execute("""
+            SELECT DISTINCT b.id
+              FROM shopping_budget b
+              JOIN unnest(%s::date[], %s::int[], %s::int[]) AS p(day, category_id, user_id)
+                ON b.start_date <= p.day
+               AND b.end_date >= p.day
+               AND (b.category_id IS NULL OR b.category_id = p.category_id)
+               AND (b.user_id IS NULL OR b.user_id = p.user_id)
+        """, [
+            [purchase[0] for purchase in purchases],
+            [purchase[1] or None for purchase in purchases],
+            [purchase[2] or None for purchase in purchases],
+        ])
+        return self.browse([row[0] for row in self.env.cr.fetchall()])
+
+    def _invalidate_actual_spent(self):
+        """جدولة إعادة حساب المصروف للميزانيات المحددة فقط"""
+        for fname in ('actual_spent', 'remaining', 'usage_percentage'):
+            self.env.add_to_compute(self._fields[fname], self)
+
+    @api.constrains('alert_thresholds')
+    def _check_alert_thresholds(self):
+        for record in self:
+            for value in (record.alert_thresholds or '').split(','):
+                if not value.strip():
+                    continue
+                try:
+                    threshold = int(float(value))
+                except (ValueError, OverflowError):
+                    raise ValidationError("Invalid alert threshold '{}'.".format(value.strip()))
+                if threshold <= 0:
+                    raise ValidationError("Alert thresholds must be positive percentages.")
+
+    def _get_alert_thresholds(self):
+        """نسب التنبيه المحددة للميزانية مع تجاهل القيم غير الصالحة"""
+        self.ensure_one()
+        thresholds = set()
+        for value in (self.alert_thresholds or '').split(','):
+            try:
+                thresholds.add(int(float(value)))
+            except (ValueError, OverflowError):
+                # القيم المحفوظة قبل إضافة التحقق لا يجب أن تمنع تسجيل المشتريات
+                continue
+        return sorted(threshold for threshold in thresholds if threshold > 0)
+
+    def _check_alerts(self):
+        """تسجيل العتبات التي تم تجاوزها وإشعار صاحب الميزانية مرة واحدة لكل عتبة
+
+        القيد الفريد على (الميزانية، العتبة) مع ON CONFLICT DO NOTHING يضمن
+        أن معاملة واحدة فقط تسجل كل تجاوز حتى عند الشراء بالتوازي.
+        """
+        crossed = [
+            (budget, threshold)
+            for budget in self if budget.amount > 0
+            for threshold in budget._get_alert_thresholds()
+            if budget.usage_percentage >= threshold
+        ]
+        if not crossed:
+            return
+        self.env.cr.execute("""
+            INSERT INTO shopping_budget_alert
+                        (budget_id, threshold, spent, amount, create_uid, create_date, write_uid, write_date)
+                 SELECT v.budget_id, v.threshold, v.spent, v.amount,
+                        %s, now() at time zone 'UTC', %s, now() at time zone 'UTC'
+                   FROM unnest(%s::int[], %s::int[], %s::float8[], %s::float8[])
+                        AS v(budget_id, threshold, spent, amount)
+            ON CONFLICT (budget_id, threshold) DO NOTHING
+              RETURNING budget_id, threshold
+        """, [
+            self.env.uid, self.env.uid,
+            [budget.id for budget, _threshold in crossed],
+            [threshold for _budget, threshold in crossed],
+            [budget.actual_spent for budget, _threshold in crossed],
+            [budget.amount for budget, _threshold in crossed],
+        ])
+        new_alerts = defaultdict(list)
+        for budget_id, threshold in self.env.cr.fetchall():
+            new_alerts[budget_id].append(threshold)
+        if not new_alerts:
+            return
+        self.env['shopping.budget.alert'].invalidate_model()
+        self.invalidate_recordset(['alert_ids'])
+        for budget in self.browse(list(new_alerts)):
+            budget._notify_alert(max(new_alerts[budget.id]))
+
+    def _notify_alert(self, threshold):
+        """إشعار صاحب الميزانية في سجل الميزانية وعبر الـ bus"""
+        self.ensure_one()
+        partner = (self.user_id or self.create_uid).partner_id
+        message = "Budget {} reached {}% of its amount ({:.2f} of {:.2f}).".format(
+            self.name, threshold, self.actual_spent, self.amount)
+        self.sudo().message_post(
+            body=message,
+            partner_ids=partner.ids,
+            subtype_xmlid='mail.mt_comment',
+        )
+        self.env['bus.bus']._sendone(partner, 'simple_notification', {
+            'title': 'Budget alert',
+            'message': message,
+            'type': 'danger' if threshold >= 100 else 'warning',
+            'sticky': threshold >= 100,
+        })
+
+    # الحقول التي تؤثر على لوحة التحكم
+    _DASHBOARD_FIELDS = {'user_id', 'amount', 'start_date', 'end_date', 'category_id'}
+    # الحقول التي تظهر في نتائج التقارير المخزنة مؤقتًا
+    _REPORT_FIELDS = _DASHBOARD_FIELDS | {'name'}
+
+    @api.model_create_multi
+    def create(self, vals_list):
+        budgets = super().create(vals_list)
+        self.env['shopping.dashboard']._bump_dashboard_versions(budgets.user_id.ids)
+        self.env['shopping.report.cache']._bump_data_version()
+        return budgets
+
+    def write(self, vals):
+        if not self._REPORT_FIELDS.isdisjoint(vals):
+            self.env['shopping.report.cache']._bump_data_version()
+        if self._DASHBOARD_FIELDS.isdisjoint(vals):
+            return super().write(vals)
+        user_ids = set(self.user_id.ids)
+        res = super().write(vals)
+        user_ids.update(self.user_id.ids)
+        self.env['shopping.dashboard']._bump_dashboard_versions(user_ids)
+        return res
+
+    def unlink(self):
+        user_ids = self.user_id.ids
+        res = super().unlink()
+        self.env['shopping.dashboard']._bump_dashboard_versions(user_ids)
+        self.env['shopping.report.cache']._bump_data_version()
+        return res
+
     @api.model
     def create_monthly_budgets(self):
-        """إنشاء ميزانيات شهرية تلقائية"""
-        current_month = datetime.now().replace(day=1)
-        next_month = (current_month.replace(day=28) + timedelta(days=4)).replace(day=1)
-
-        categories = self.env['shopping.category'].search([])
-        for category in categories:
-            existing = self.search([
-                ('category_id', '=', category.id),
-                ('start_date', '=', current_month),
-                ('period', '=', 'monthly')
-            ])
-            if not existing:
-                self.create({
-                    'name': "Budget {} For Month {}".format(category.name, current_month.strftime('%B %Y')),
-                    'category_id': category.id,
-                    'period': 'monthly',
-                    'amount': 1000,  # قيمة افتراضية
-                    'start_date': current_month,
-                    'end_date': next_month - timedelta(days=1)
-                })
\ No newline at end of file
+        """إنشاء ميزانيات الشهر الحالي لكل المستخدمين والفئات"""
+        return self._generate_period_budgets('monthly', self._get_period_start('monthly', fields.Date.today()))
+
+    @api.model
+    def _get_period_start(self, period, day):
+        """بداية الفترة التي تحتوي على اليوم المحدد"""
+        if period == 'weekly':
+            return day - timedelta(days=day.weekday())
+        elif period == 'monthly':
+            return day.replace(day=1)
+        elif period == 'yearly':
+            return day.replace(month=1, day=1)
+        return day
+
+    @api.model
+    def _cron_generate_budgets(self):
+        """إنشاء ميزانيات الفترة الحالية لكل أنواع الفترات"""
+        today = fields.Date.today()
+        for period in BUDGET_PERIODS:
+            self._generate_period_budgets(period, self._get_period_start(period, today))
+            self.env.cr.commit()
+            self.env.invalidate_all()
+
+    @api.model
+    def _generate_period_budgets(self, period, period_start):
+        """إنشاء ميزانيات الفترة لكل زوج (مستخدم، فئة) بفحص وجود واحد وعمليات create مجمعة
+
+        الأزواج المرشحة هي ميزانيات الفترة السابقة، وفي فترات BUDGET_SEED_PERIODS فقط
+        الفئات التي تم الصرف عليها في الفترة السابقة. المبلغ يؤخذ من الميزانية السابقة
+        أو من المصروف الفعلي عند عدم وجودها.
+        """
+        delta = BUDGET_PERIODS[period]
+        period_end = period_start + delta - timedelta(days=1)
+        previous_start = period_start - delta
+
+        self.flush_model(['user_id', 'category_id', 'period', 'start_date', 'amount'])
+        self.env['shopping.item'].flush_model(['bought', 'date_bought', 'quantity', 'actual_price', 'category_id', 'user_id'])
+        self.env.cr.execute("""
+            WITH previous_budgets AS (
+                SELECT DISTINCT ON (user_id, category_id) user_id, category_id, amount
+                  FROM shopping_budget
+                 WHERE period = %(period)s AND start_date = %(previous_start)s AND user_id IS NOT NULL
+              ORDER BY user_id, category_id, id DESC
+            ), previous_spent AS (
+                SELECT i.user_id, i.category_id, sum(i.quantity * coalesce(i.actual_price, 0)) AS amount
+                  FROM shopping_item i
+                 WHERE %(seed)s
+                   AND i.bought
+                   AND i.date_bought >= %(previous_start)s
+                   AND i.date_bought < %(period_start)s
+                   AND i.category_id IS NOT NULL
+                   AND i.user_id IS NOT NULL
+              GROUP BY i.user_id, i.category_id
+                HAVING sum(i.quantity * coalesce(i.actual_price, 0)) > 0
+            )
+            SELECT coalesce(b.user_id, s.user_id), coalesce(b.category_id, s.category_id), coalesce(b.amount, s.amount)
+              FROM previous_budgets b
+         FULL JOIN previous_spent s
+                ON s.user_id = b.user_id AND s.category_id = coalesce(b.category_id, 0)
+        """, {
+            'period': period,
+            'previous_start': previous_start,
+            'period_start': period_start,
+            'seed': period in BUDGET_SEED_PERIODS,
+        })
+        candidates = self.env.cr.fetchall()
+        if not candidates:
+            return self.browse()
+
+        # فحص واحد للأزواج التي لديها ميزانية لهذه الفترة مسبقًا
+        self.env.cr.execute("""
+            SELECT user_id, category_id
+              FROM shopping_budget
+             WHERE period = %s AND start_date = %s
+        """, [period, period_start])
+        existing = set(self.env.cr.fetchall())
+
+        categories = self.env['shopping.category'].browse(
+            {category_id for _user_id, category_id, _amount in candidates if category_id})
+        category_names = {category.id: category.name for category in categories}
+        period_label = dict(self._fields['period'].selection)[period]
+        vals_list = [{
+            'name': "Budget {} {} {}".format(category_names.get(category_id, 'All categories'), period_label, period_start),
+            'user_id': user_id,
+            'category_id': category_id,
+            'period': period,
+            'amount': amount,
+            'start_date': period_start,
+            'end_date': period_end,
+        } for user_id, category_id, amount in candidates if (user_id, category_id) not in existing]
+
+        budgets = self.browse()
+        for start in range(0, len(vals_list), BUDGET_BATCH_SIZE):
+            budgets |= self.create(vals_list[start:start + BUDGET_BATCH_SIZE])
+        return budgets
+
+
+class ShoppingBudgetAlert(models.Model):
+    _name = 'shopping.budget.alert'
+    _description = 'Budget threshold alert'
+    _order = 'create_date desc'
+
+    budget_id = fields.Many2one('shopping.budget', string='Budget', required=True, ondelete='cascade', index=True)
+    threshold = fields.Integer(string='Threshold (%)', required=True)
+    spent = fields.Float(string='Spent')
+    amount = fields.Float(string='Amount')
+
+    _sql_constraints = [
+        ('budget_threshold_uniq', 'unique(budget_id, threshold)', 'A budget threshold can only be alerted once!'),
+    ]
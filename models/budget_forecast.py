@@ -0,0 +1,102 @@
+from odoo import models, api
+from dateutil.relativedelta import relativedelta
+import numpy as np
+
+
+# عدد الأشهر السابقة المستخدمة في التنبؤ
+FORECAST_HISTORY_MONTHS = 36
+# أقل عدد أشهر لتقدير العامل الموسمي (سنتان كاملتان)
+FORECAST_SEASONAL_MIN_MONTHS = 24
+# معاملات التنعيم الأسي (المستوى والاتجاه)
+FORECAST_ALPHA = 0.4
+FORECAST_BETA = 0.1
+
+
+class ShoppingBudgetForecast(models.AbstractModel):
+    _name = 'shopping.budget.forecast'
+    _description = 'Shopping budget forecasting engine'
+
+    @api.model
+    def _get_monthly_matrix(self, month_start, months, user_id=None):
+        """مصفوفة المصروف الشهري (فئة × شهر) للأشهر السابقة لـ month_start باستعلام مجمع واحد
+
+        يرجع (معرفات الفئات، المصفوفة، رقم الشهر في السنة لكل عمود).
+        """
+        first_month = month_start - relativedelta(months=months)
+        self.env['shopping.item'].flush_model(['bought', 'date_bought', 'quantity', 'actual_price', 'category_id', 'user_id'])
+        self.env.cr.execute("""
+            SELECT i.category_id,
+                   ((extract(year FROM i.date_bought) - %(year)s) * 12
+                       + extract(month FROM i.date_bought) - %(month)s)::int,
+                   sum(i.quantity * coalesce(i.actual_price, 0))
+              FROM shopping_item i
+             WHERE i.bought
+               AND i.date_bought >= %(first)s
+               AND i.date_bought < %(end)s
+               AND (%(user_id)s IS NULL OR i.user_id = %(user_id)s)
+          GROUP BY 1, 2
+        """, {
+            'year': first_month.year,
+            'month': first_month.month,
+            'first': first_month,
+            'end': month_start,
+            'user_id': user_id,
+        })
+        rows = self.env.cr.fetchall()
+        category_ids = sorted({row[0] for row in rows}, key=lambda category_id: category_id or 0)
+        positions = {category_id: index for index, category_id in enumerate(category_ids)}
+        matrix = np.zeros((len(category_ids), months))
+        if rows:
+            category_index, month_index, spent = zip(*rows)
+            matrix[[positions[category_id] for category_id in category_index],
+                   list(month_index)] = spent
+        calendar_months = (first_month.month - 1 + np.arange(months)) % 12
+        return category_ids, matrix, calendar_months
+
+    @api.model
+    def forecast(self, month_start, horizon=1, user_id=None, history_months=FORECAST_HISTORY_MONTHS):
+        """توقع مصروف كل فئة لعدد horizon من الأشهر بدءًا من month_start
+
+        يتم تطبيق تنعيم Holt الأسي على كل الفئات معًا كعمليات على المصفوفة،
+        مع عامل موسمي لكل شهر عند توفر سنتين من البيانات على الأقل.
+        يرجع قاموس الفئة -> المبلغ المتوقع.
+        """
+        category_ids, matrix, calendar_months = self._get_monthly_matrix(month_start, history_months, user_id)
+        if not category_ids:
+            return {}
+
+        # تجاهل الأشهر الأولى التي لا توجد فيها أي مشتريات
+        active_months = np.flatnonzero(matrix.any(axis=0))
+        if not active_months.size:
+            return dict.fromkeys(category_ids, 0.0)
+        matrix = matrix[:, active_months[0]:]
+        calendar_months = calendar_months[active_months[0]:]
+        months = matrix.shape[1]
+
+        seasonal = np.zeros((len(category_ids), 12))
+        if months >= FORECAST_SEASONAL_MIN_MONTHS:
+            # الانحراف عن متوسط كل سنة كاملة، مع حساب المتوسط لكل شهر عبر السنوات
+            offset = months % 12
+            years = matrix[:, offset:].reshape(len(category_ids), -1, 12)
+            deviation = (years - years.mean(axis=2, keepdims=True)).mean(axis=1)
+            seasonal[:, calendar_months[offset:offset + 12]] = deviation
+        values = matrix - seasonal[:, calendar_months]
+
+        level = values[:, 0]
+        trend = np.zeros(len(category_ids))
+        for month in range(1, months):
+            previous_level = level
+            level = FORECAST_ALPHA * values[:, month] + (1 - FORECAST_ALPHA) * (level + trend)
+            trend = FORECAST_BETA * (level - previous_level) + (1 - FORECAST_BETA) * trend
+
+        steps = np.arange(1, horizon + 1)
+        target_months = (month_start.month - 1 + np.arange(horizon)) % 12
+        forecast = level[:, None] + trend[:, None] * steps + seasonal[:, target_months]
+        totals = np.clip(forecast, 0, None).sum(axis=1)
+        return dict(zip(category_ids, totals.tolist()))
+
+    @api.model
+    def monthly_average(self, month_start, months, user_id=None):
+        """متوسط المصروف الشهري لكل فئة خلال الأشهر السابقة"""
+        category_ids, matrix, _calendar_months = self._get_monthly_matrix(month_start, months, user_id)
+        return dict(zip(category_ids, matrix.mean(axis=1).tolist())) if category_ids else {}
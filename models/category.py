@@ -1,4 +1,9 @@
 from odoo import models, fields, api
+from odoo.exceptions import UserError
+from collections import defaultdict
+
+# الفاصل بين مستويات المسار في complete_name وملفات الاستيراد
+CATEGORY_PATH_SEPARATOR = ' / '
 
 class ShoppingCategory(models.Model):
     _name = 'shopping.category'
@@ -16,24 +21,236 @@ class ShoppingCategory(models.Model):
     color = fields.Integer(string='Color')
     description = fields.Text(string='Description')
     item_count = fields.Integer(string='number of items', compute='_compute_item_count')
+    item_count_total = fields.Integer(string='Items including subcategories', compute='_compute_item_count')
+    spent_total = fields.Float(string='Spent including subcategories', compute='_compute_item_count')
     
     _sql_constraints = [
         ('name_uniq', 'unique(name)', 'The category name must be unique!'),
     ]
 
-    @api.depends('name', 'parent_id.complete_name')
+    # الفئات الفرعية يتم تحديثها في write عبر _rebuild_subtrees بدل إعادة الحساب فئة بفئة
+    @api.depends('name', 'parent_id')
     def _compute_complete_name(self):
         for category in self:
             if category.parent_id:
-                category.complete_name = "{} / {}".format(category.parent_id.complete_name, category.name)
+                category.complete_name = "{}{}{}".format(
+                    category.parent_id.complete_name, CATEGORY_PATH_SEPARATOR, category.name)
             else:
                 category.complete_name = category.name
 
+    def write(self, vals):
+        res = super().write(vals)
+        if 'name' in vals or 'parent_id' in vals:
+            self._rebuild_subtrees()
+        return res
+
+    def unlink(self):
+        # العناصر والميزانيات تفقد فئتها عبر ondelete دون المرور بـ write
+        self.env['shopping.report.cache']._bump_data_version()
+        self._bump_dashboard_versions()
+        return super().unlink()
+
+    def _bump_dashboard_versions(self):
+        """إبطال لقطات لوحة التحكم لأصحاب العناصر في الفئات، لأن أسماءها تظهر في إحصائيات الفئات"""
+        if not self:
+            return
+        self.env['shopping.item'].flush_model(['category_id', 'user_id'])
+        self.env.cr.execute("""
+            SELECT DISTINCT user_id
+              FROM shopping_item
+             WHERE category_id IN %s AND user_id IS NOT NULL
+        """, [tuple(self.ids)])
+        self.env['shopping.dashboard']._bump_dashboard_versions([row[0] for row in self.env.cr.fetchall()])
+
+    def _rebuild_subtrees(self):
+        """إعادة حساب parent_path و complete_name للفئات وكل فروعها بقراءة واحدة وتحديث واحد"""
+        if not self:
+            return
+        # أسماء الفئات ومساراتها تظهر في نتائج التقارير ولوحة التحكم المخزنة مؤقتًا
+        self.env['shopping.report.cache']._bump_data_version()
+        self._bump_dashboard_versions()
+        self.flush_model(['name', 'parent_id', 'parent_path', 'complete_name'])
+        lang = self.env.lang or 'en_US'
+        self.env.cr.execute("""
+            WITH RECURSIVE tree AS (
+                SELECT id, parent_id FROM shopping_category WHERE id IN %(ids)s
+                 UNION
+                SELECT c.id, c.parent_id FROM shopping_category c JOIN tree t ON c.parent_id = t.id
+            )
+            SELECT c.id, c.parent_id, coalesce(c.name->>%(lang)s, c.name->>'en_US')
+              FROM shopping_category c
+              JOIN tree t ON t.id = c.id
+        """, {'ids': tuple(self.ids), 'lang': lang})
+        nodes = {node_id: (parent_id, name) for node_id, parent_id, name in self.env.cr.fetchall()}
+
+        children = defaultdict(list)
+        anchors = set()
+        for node_id, (parent_id, _name) in nodes.items():
+            children[parent_id].append(node_id)
+            if parent_id not in nodes:
+                anchors.add(parent_id)
+
+        # المسار والاسم الكامل للآباء خارج الشجرة المعاد بناؤها
+        paths = {None: ('', '')}
+        anchor_ids = tuple(anchor for anchor in anchors if anchor)
+        if anchor_ids:
+            self.env.cr.execute("""
+                SELECT id, parent_path, complete_name FROM shopping_category WHERE id IN %s
+            """, [anchor_ids])
+            paths.update((row[0], row[1:]) for row in self.env.cr.fetchall())
+
+        ids, parent_paths, complete_names = [], [], []
+        stack = list(anchors)
+        while stack:
+            parent_id = stack.pop()
+            parent_path, parent_name = paths[parent_id]
+            for node_id in children.pop(parent_id, ()):
+                name = nodes[node_id][1]
+                paths[node_id] = (
+                    '{}{}/'.format(parent_path, node_id),
+                    '{}{}{}'.format(parent_name, CATEGORY_PATH_SEPARATOR, name) if parent_id else name,
+                )
+                ids.append(node_id)
+                parent_paths.append(paths[node_id][0])
+                complete_names.append(paths[node_id][1])
+                stack.append(node_id)
+        if len(ids) != len(nodes):
+            # عقد لم يتم الوصول إليها من أي أب خارجي تشكل حلقة
+            raise UserError("You cannot create recursive categories.")
+
+        self.env.cr.execute("""
+            UPDATE shopping_category c
+               SET parent_path = v.parent_path, complete_name = v.complete_name
+              FROM unnest(%s::int[], %s::varchar[], %s::varchar[]) AS v(id, parent_path, complete_name)
+             WHERE c.id = v.id
+        """, [ids, parent_paths, complete_names])
+        self.invalidate_model(['parent_path', 'complete_name'])
+
+    def _move_to(self, parent):
+        """نقل الفئات مع فروعها تحت فئة أب جديدة (أو إلى الجذر)"""
+        self._reparent(dict.fromkeys(self.ids, parent.id))
+
+    @api.model
+    def _reparent(self, parent_by_id):
+        """تغيير آباء عدة فئات بتحديث واحد ثم إعادة بناء فروعها مرة واحدة"""
+        if not parent_by_id:
+            return
+        category_ids = list(parent_by_id)
+        self.flush_model(['parent_id'])
+        self.env.cr.execute("""
+            UPDATE shopping_category c
+               SET parent_id = v.parent_id, write_uid = %s, write_date = now() at time zone 'UTC'
+              FROM unnest(%s::int[], %s::int[]) AS v(id, parent_id)
+             WHERE c.id = v.id
+        """, [self.env.uid, category_ids, [parent_by_id[category_id] or None for category_id in category_ids]])
+        self.invalidate_model(['parent_id', 'child_ids', 'write_uid', 'write_date'])
+        self.browse(category_ids)._rebuild_subtrees()
+
+    def _merge_into(self, target):
+        """دمج الفئات في الفئة الهدف مع نقل العناصر والميزانيات والفئات الفرعية"""
+        target.ensure_one()
+        sources = self - target
+        if not sources:
+            return target
+        if any(target.parent_path.startswith(source.parent_path) for source in sources):
+            raise UserError("A category cannot be merged into one of its own subcategories.")
+
+        # نقل العناصر والميزانيات بكتابة واحدة لكل نموذج حتى يتم تحديث المجاميع والميزانيات المتأثرة
+        self.env['shopping.item'].search([('category_id', 'in', sources.ids)]).write({'category_id': target.id})
+        self.env['shopping.budget'].search([('category_id', 'in', sources.ids)]).write({'category_id': target.id})
+        (self.search([('parent_id', 'in', sources.ids)]) - sources)._move_to(target)
+        sources.unlink()
+        return target
+
+    @api.model
+    def _import_hierarchy(self, paths, move_existing=True):
+        """إنشاء أو إعادة ترتيب شجرة فئات من مسارات مثل 'A / B / C'
+
+        يتم الإنشاء مستوى بمستوى بعملية create واحدة لكل مستوى، والفئات الموجودة بنفس الاسم
+        تُنقل تحت الأب المحدد في الملف. يرجع قاموس المسار -> معرف الفئة.
+        مع move_existing=False لا يتم نقل أي فئة موجودة: المسارات التي تتعارض مع الشجرة
+        الحالية أو مع بعضها لا يُنشأ منها شيء ولا تظهر في النتيجة.
+        """
+        path_parts = {}
+        parent_names = defaultdict(set)
+        for path in paths:
+            parts = [part.strip() for part in path.split('/') if part.strip()]
+            if not parts:
+                continue
+            path_parts[path] = parts
+            for depth, name in enumerate(parts):
+                parent_names[name].add(parts[depth - 1] if depth else False)
+        conflicts = {name for name, names in parent_names.items() if len(names) > 1}
+        if conflicts and move_existing:
+            raise UserError("Category '{}' appears under different parents.".format(min(conflicts)))
+
+        existing = self.search_read([('name', 'in', list(parent_names))], ['name', 'parent_id'], load=False)
+        ids = {category['name']: category['id'] for category in existing}
+        current_parents = {category['id']: category['parent_id'] for category in existing}
+
+        if not move_existing:
+            def fits_tree(parts):
+                # كل فئة موجودة في المسار يجب أن تكون تحت نفس الأب الموجود في المسار
+                for depth, name in enumerate(parts):
+                    if name in conflicts:
+                        return False
+                    if name in ids:
+                        parent_id = ids.get(parts[depth - 1]) if depth else False
+                        if current_parents[ids[name]] != parent_id:
+                            return False
+                return True
+            path_parts = {path: parts for path, parts in path_parts.items() if fits_tree(parts)}
+
+        parents = {}
+        levels = defaultdict(list)
+        for parts in path_parts.values():
+            for depth, name in enumerate(parts):
+                if name not in parents:
+                    parents[name] = parts[depth - 1] if depth else False
+                    levels[depth].append(name)
+
+        moves = {}
+        for depth in sorted(levels):
+            missing = [name for name in levels[depth] if name not in ids]
+            created = self.create([{
+                'name': name,
+                'parent_id': ids[parents[name]] if parents[name] else False,
+            } for name in missing])
+            ids.update(zip(missing, created.ids))
+            for name in levels[depth]:
+                parent_id = ids[parents[name]] if parents[name] else False
+                category_id = ids[name]
+                if category_id in current_parents and current_parents[category_id] != parent_id:
+                    moves[category_id] = parent_id
+
+        self._reparent(moves)
+        return {path: ids[parts[-1]] for path, parts in path_parts.items()}
+
     def _compute_item_count(self):
+        """حساب عدد العناصر والمصروف لكل الفئات مع الفئات الفرعية في استعلام واحد"""
+        category_ids = tuple(category._origin.id for category in self if category._origin.id)
+        stats = {}
+        if category_ids:
+            self.env['shopping.item'].flush_model(['category_id', 'bought', 'quantity', 'actual_price'])
+            self.flush_model(['parent_path'])
+            # الفئات الفرعية هي كل الفئات التي يبدأ parent_path الخاص بها بمسار الفئة
+            self.env.cr.execute("""
+                SELECT c.id,
+                       count(i.id) FILTER (WHERE i.category_id = c.id),
+                       count(i.id),
+                       coalesce(sum(i.quantity * coalesce(i.actual_price, 0)) FILTER (WHERE i.bought), 0)
+                  FROM shopping_category c
+                  JOIN shopping_category d ON d.parent_path LIKE c.parent_path || '%%'
+                  JOIN shopping_item i ON i.category_id = d.id
+                 WHERE c.id IN %s
+              GROUP BY c.id
+            """, [category_ids])
+            stats = {row[0]: row[1:] for row in self.env.cr.fetchall()}
         for category in self:
-            category.item_count = self.env['shopping.item'].search_count([
-                ('category_id', '=', category.id)
-            ])
+            item_count, item_count_total, spent_total = stats.get(category._origin.id, (0, 0, 0.0))
+            category.item_count = item_count
+            category.item_count_total = item_count_total
+            category.spent_total = spent_total
 
     def action_view_items(self):
         """عرض عناصر هذه الفئة"""
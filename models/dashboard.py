@@ -0,0 +1,194 @@
+from odoo import models, fields, api
+import json
+import psycopg2
+
+
+class ShoppingDashboard(models.AbstractModel):
+    _name = 'shopping.dashboard'
+    _description = 'Shopping dashboard'
+
+    @api.model
+    def get_dashboard_data(self):
+        """الحصول على بيانات لوحة التحكم للمستخدم الحالي"""
+        return self._compute_dashboard_data(self.env.uid)
+
+    @api.model
+    def get_dashboard_snapshot(self, etag=None):
+        """بيانات لوحة التحكم من اللقطة المخزنة مع دعم ETag"""
+        current_etag, data = self.env['shopping.dashboard.snapshot'].sudo()._get_snapshot(self.env.uid, etag)
+        if data is None:
+            return {'not_modified': True, 'etag': current_etag}
+        return dict(data, etag=current_etag)
+
+    @api.model
+    def _bump_dashboard_versions(self, user_ids):
+        """إبطال لقطات لوحة التحكم للمستخدمين المتأثرين"""
+        self.env['shopping.dashboard.snapshot'].sudo()._bump_versions(user_ids)
+
+    @api.model
+    def _compute_dashboard_data(self, user_id):
+        """تجميع كل عناصر لوحة التحكم بعدد ثابت من الاستعلامات"""
+        for model in ('shopping.item', 'shopping.list', 'shopping.budget'):
+            self.env[model].flush_model()
+
+        data = {}
+        data.update(self._get_list_stats(user_id))
+        data.update(self._get_item_stats(user_id))
+        data.update(self._get_budget_stats(user_id))
+        data['recent_lists'] = self._get_recent_lists(user_id)
+        return data
+
+    @api.model
+    def _get_list_stats(self, user_id):
+        """عدد القوائم ومتوسط الإنجاز في استعلام واحد"""
+        self.env.cr.execute("""
+            SELECT count(*), coalesce(avg(completion_rate), 0)
+              FROM shopping_list
+             WHERE user_id = %s
+        """, [user_id])
+        total_lists, avg_completion = self.env.cr.fetchone()
+        return {
+            'total_lists': total_lists,
+            'avg_completion': float(avg_completion),
+        }
+
+    @api.model
+    def _get_item_stats(self, user_id):
+        """إحصائيات العناصر حسب الأولوية والفئة في تمريرة واحدة"""
+        self.env.cr.execute("""
+            SELECT GROUPING(i.priority) AS by_category,
+                   i.priority,
+                   i.category_id,
+                   count(*),
+                   count(*) FILTER (WHERE i.bought),
+                   coalesce(sum(i.quantity * coalesce(i.actual_price, 0)) FILTER (WHERE i.bought), 0)
+              FROM shopping_item i
+             WHERE i.user_id = %s
+          GROUP BY GROUPING SETS ((i.priority), (i.category_id))
+        """, [user_id])
+
+        priority_stats = {'high': 0, 'medium': 0, 'low': 0}
+        category_counts = {}
+        bought_items = 0
+        used_budget = 0.0
+        for by_category, priority, category_id, count, bought, spent in self.env.cr.fetchall():
+            if by_category:
+                if category_id:
+                    category_counts[category_id] = count
+                continue
+            # مجاميع الشراء تُحسب من مجموعات الأولوية فقط لتجنب العد المزدوج
+            bought_items += bought
+            used_budget += spent
+            if priority in priority_stats:
+                priority_stats[priority] = count
+
+        categories = self.env['shopping.category'].browse(list(category_counts))
+        category_stats = {category.name: category_counts[category.id] for category in categories}
+
+        return {
+            'bought_items': bought_items,
+            'used_budget': used_budget,
+            'priority_stats': priority_stats,
+            'category_stats': category_stats,
+        }
+
+    @api.model
+    def _get_budget_stats(self, user_id):
+        """إحصائيات الميزانيات الحالية للمستخدم"""
+        today = fields.Date.today()
+        self.env.cr.execute("""
+            SELECT coalesce(sum(amount), 0), coalesce(sum(actual_spent), 0)
+              FROM shopping_budget
+             WHERE user_id = %s
+               AND start_date <= %s
+               AND end_date >= %s
+        """, [user_id, today, today])
+        total_budget, budget_used = self.env.cr.fetchone()
+        return {
+            'total_budget': total_budget,
+            'budget_used': budget_used,
+            'budget_remaining': total_budget - budget_used,
+        }
+
+    @api.model
+    def _get_recent_lists(self, user_id):
+        """القوائم الحديثة"""
+        recent_lists = self.env['shopping.list'].search_read(
+            [('user_id', '=', user_id)],
+            ['name', 'state', 'completion_rate'],
+            limit=5, order='create_date desc')
+        return [{
+            'name': lst['name'],
+            'state': lst['state'],
+            'completion_rate': lst['completion_rate'],
+        } for lst in recent_lists]
+
+
+class ShoppingDashboardSnapshot(models.Model):
+    _name = 'shopping.dashboard.snapshot'
+    _description = 'Shopping dashboard snapshot'
+
+    user_id = fields.Many2one('res.users', string='user', required=True, ondelete='cascade', index=True)
+    version = fields.Integer(string='Version', default=1)
+    payload_version = fields.Integer(string='Payload version')
+    # إحصائيات الميزانيات تعتمد على تاريخ اليوم، فاللقطة صالحة فقط في يوم حسابها
+    payload_date = fields.Date(string='Payload date')
+    payload = fields.Text(string='Payload')
+
+    _sql_constraints = [
+        ('user_uniq', 'unique(user_id)', 'Only one dashboard snapshot per user is allowed!'),
+    ]
+
+    @api.model
+    def _bump_versions(self, user_ids):
+        """زيادة رقم الإصدار للمستخدمين المتأثرين فقط"""
+        user_ids = sorted({user_id for user_id in user_ids if user_id})
+        if not user_ids:
+            return
+        self.env.cr.execute("""
+            INSERT INTO shopping_dashboard_snapshot
+                        (user_id, version, create_uid, create_date, write_uid, write_date)
+                 SELECT u, 1, %(uid)s, now() at time zone 'UTC', %(uid)s, now() at time zone 'UTC'
+                   FROM unnest(%(user_ids)s) AS u
+            ON CONFLICT (user_id) DO UPDATE
+                    SET version = shopping_dashboard_snapshot.version + 1,
+                        write_date = EXCLUDED.write_date
+        """, {'uid': self.env.uid, 'user_ids': user_ids})
+        self.invalidate_model(['version'])
+
+    @api.model
+    def _get_snapshot(self, user_id, etag=None):
+        """إرجاع (etag, payload) مع payload = None إذا لم تتغير البيانات"""
+        self.env.cr.execute("""
+            INSERT INTO shopping_dashboard_snapshot
+                        (user_id, version, create_uid, create_date, write_uid, write_date)
+                 VALUES (%(user_id)s, 1, %(uid)s, now() at time zone 'UTC', %(uid)s, now() at time zone 'UTC')
+            ON CONFLICT (user_id) DO NOTHING
+        """, {'user_id': user_id, 'uid': self.env.uid})
+        self.env.cr.execute("""
+            SELECT version, payload_version, payload_date, payload
+              FROM shopping_dashboard_snapshot
+             WHERE user_id = %s
+        """, [user_id])
+        version, payload_version, payload_date, payload = self.env.cr.fetchone()
+
+        today = fields.Date.today()
+        current_etag = '"{}-{}-{}"'.format(user_id, version, today)
+        if etag == current_etag:
+            return current_etag, None
+        if payload and payload_version == version and payload_date == today:
+            return current_etag, json.loads(payload)
+
+        data = self.env['shopping.dashboard']._compute_dashboard_data(user_id)
+        try:
+            with self.env.cr.savepoint(flush=False):
+                self.env.cr.execute("""
+                    UPDATE shopping_dashboard_snapshot
+                       SET payload = %s, payload_version = %s, payload_date = %s
+                     WHERE user_id = %s AND version = %s
+                """, [json.dumps(data), version, today, user_id, version])
+        except psycopg2.errors.SerializationFailure:
+            # تم تحديث الإصدار بالتوازي، سيتم الحساب مرة أخرى في الطلب التالي
+            pass
+        self.invalidate_model(['payload', 'payload_version', 'payload_date'])
+        return current_etag, data
@@ -0,0 +1,152 @@
+from odoo import models, fields, api
+from odoo.exceptions import UserError
+import logging
+import time
+
+_logger = logging.getLogger(__name__)
+
+# الحد الأقصى لمدة تشغيل المهمة المجدولة بالثواني قبل التوقف والاستئناف لاحقًا
+IMPORT_JOB_TIME_LIMIT = 240
+
+
+class ImportJobInterrupted(Exception):
+    """إيقاف المهمة بعد حفظ نقطة التقدم عند انتهاء الوقت المتاح"""
+
+
+class ShoppingImportJob(models.Model):
+    _name = 'shopping.import.job'
+    _description = 'Shopping import job'
+    _order = 'create_date desc'
+
+    name = fields.Char(string='Name', required=True)
+    user_id = fields.Many2one('res.users', string='user', required=True, default=lambda self: self.env.user)
+    list_id = fields.Many2one('shopping.list', string='Destination List', required=True, ondelete='cascade')
+    import_override = fields.Boolean(string='Replace existing data', default=False)
+    attachment_id = fields.Many2one('ir.attachment', string='File', required=True)
+    state = fields.Selection([
+        ('pending', 'Pending'),
+        ('running', 'Running'),
+        ('done', 'Done'),
+        ('failed', 'Failed'),
+        ('cancelled', 'Cancelled'),
+    ], string='state', default='pending', required=True, index=True)
+
+    # نقطة التقدم: عدد الصفوف التي تمت معالجتها من بداية الملف
+    row_offset = fields.Integer(string='Processed rows', readonly=True)
+    rows_imported = fields.Integer(string='Imported rows', readonly=True)
+    rows_failed = fields.Integer(string='Failed rows', readonly=True)
+    processing_time = fields.Float(string='Processing time (s)', readonly=True)
+    throughput = fields.Float(string='Rows per second', compute='_compute_throughput')
+    error_log = fields.Text(string='Errors', readonly=True)
+    date_started = fields.Datetime(string='Started on', readonly=True)
+    date_finished = fields.Datetime(string='Finished on', readonly=True)
+
+    @api.depends('row_offset', 'processing_time')
+    def _compute_throughput(self):
+        for record in self:
+            record.throughput = record.row_offset / record.processing_time if record.processing_time else 0.0
+
+    def action_cancel(self):
+        self.filtered(lambda job: job.state in ('pending', 'running')).write({'state': 'cancelled'})
+
+    def action_resume(self):
+        """إعادة تشغيل المهمة من آخر نقطة تقدم محفوظة"""
+        if self.filtered(lambda job: job.state == 'done'):
+            raise UserError("Completed jobs cannot be resumed.")
+        self.write({'state': 'pending'})
+        self._trigger_processing()
+
+    def _is_cancelled(self):
+        """قراءة آخر حالة محفوظة للمهمة، لأن الإلغاء يتم من معاملة أخرى أثناء التشغيل"""
+        self.ensure_one()
+        with self.pool.cursor() as cr:
+            cr.execute("SELECT state FROM shopping_import_job WHERE id = %s", [self.id])
+            row = cr.fetchone()
+        return not row or row[0] == 'cancelled'
+
+    @api.model
+    def _trigger_processing(self):
+        cron = self.env.ref('Shopping_List.ir_cron_process_import_jobs', raise_if_not_found=False)
+        if cron:
+            cron._trigger()
+
+    @api.model
+    def _cron_process_jobs(self, time_limit=IMPORT_JOB_TIME_LIMIT):
+        """معالجة مهام الاستيراد المعلقة أو المتوقفة حتى انتهاء الوقت المتاح"""
+        deadline = time.monotonic() + time_limit
+        while time.monotonic() < deadline:
+            job = self.search([('state', 'in', ('pending', 'running'))], order='id', limit=1)
+            if not job:
+                break
+            if not job._process(deadline):
+                # انتهى الوقت: سيتم الاستئناف من نقطة التقدم في التشغيل التالي
+                self._trigger_processing()
+                break
+
+    def _process(self, deadline):
+        """معالجة المهمة على دفعات مع حفظ نقطة التقدم بعد كل دفعة
+
+        يرجع False إذا توقفت المهمة قبل الانتهاء بسبب انتهاء الوقت.
+        """
+        self.ensure_one()
+        self.write({
+            'state': 'running',
+            'date_started': self.date_started or fields.Datetime.now(),
+        })
+        self.env.cr.commit()
+
+        base = {
+            'offset': self.row_offset,
+            'imported': self.rows_imported,
+            'failed': self.rows_failed,
+            'time': self.processing_time,
+            'log': self.error_log or '',
+        }
+        started = time.monotonic()
+        reported = [0]
+
+        def checkpoint(result):
+            if self._is_cancelled():
+                # تجاهل الدفعة الحالية وعدم حفظ أي تقدم بعد الإلغاء
+                self.env.cr.rollback()
+                raise ImportJobInterrupted()
+            new_errors = result['errors'][reported[0]:]
+            reported[0] = len(result['errors'])
+            log = base['log'] + ''.join("Row {}: {}\n".format(row, error) for row, error in new_errors)
+            self.write({
+                'row_offset': result['rows'],
+                'rows_imported': base['imported'] + result['imported'],
+                'rows_failed': base['failed'] + len(result['errors']),
+                'processing_time': base['time'] + time.monotonic() - started,
+                'error_log': log,
+            })
+            base['log'] = log
+            self.env.cr.commit()
+            if time.monotonic() >= deadline:
+                raise ImportJobInterrupted()
+
+        Wizard = self.env['shopping.import.export.wizard'].with_user(self.user_id)
+        try:
+            with Wizard._open_attachment_stream(self.attachment_id.sudo()) as stream:
+                Wizard._import_stream(stream, self.list_id.with_user(self.user_id), self.import_override,
+                                      skip_rows=base['offset'], batch_callback=checkpoint)
+        except ImportJobInterrupted:
+            # المهمة الملغاة منتهية، أما عند انتهاء الوقت فيتم الاستئناف لاحقًا
+            return self._is_cancelled()
+        except Exception as e:
+            _logger.exception("Shopping import job %s failed", self.id)
+            self.env.cr.rollback()
+            if self._is_cancelled():
+                return True
+            self.write({
+                'state': 'failed',
+                'error_log': (self.error_log or '') + "Import error: {}\n".format(e),
+                'date_finished': fields.Datetime.now(),
+            })
+            self.env.cr.commit()
+            return True
+
+        if not self._is_cancelled():
+            self.write({'state': 'done', 'date_finished': fields.Datetime.now()})
+            self.env.cr.commit()
+        return True
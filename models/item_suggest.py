@@ -0,0 +1,141 @@
+from odoo import models, api
+from bisect import bisect_left, insort
+from collections import OrderedDict
+from functools import partial
+import heapq
+import threading
+import time
+
+
+# الحد الأقصى لعدد فهارس المستخدمين المحفوظة في ذاكرة كل عامل
+SUGGEST_MAX_USERS = 256
+# إعادة بناء الفهرس بالكامل دوريًا لإزالة العناصر المحذوفة أو المعاد تسميتها،
+# ولإضافة المشتريات التي سجلها عامل آخر
+SUGGEST_REBUILD_SECONDS = 3600
+
+_indexes = OrderedDict()
+_indexes_lock = threading.Lock()
+
+
+class _SuggestIndex:
+    """فهرس بادئات لأسماء عناصر مستخدم واحد مرتب حسب التكرار"""
+
+    def __init__(self):
+        self.keys = []
+        self.entries = {}
+        self.built_at = time.monotonic()
+        self.lock = threading.Lock()
+
+    def add(self, key, name, count, item_id, uom, category_id, estimated_price, store):
+        """إضافة اسم إلى الفهرس أو تحديث تكراره وآخر قيمه"""
+        entry = self.entries.get(key)
+        if entry is None:
+            insort(self.keys, key)
+            entry = self.entries[key] = {'name': name, 'count': 0, 'item_id': 0}
+        entry['count'] += count
+        if item_id >= entry['item_id']:
+            entry.update({
+                'name': name,
+                'item_id': item_id,
+                'uom': uom,
+                'category_id': category_id,
+                'estimated_price': estimated_price,
+                'store': store,
+            })
+
+    def search(self, prefix, limit):
+        """أكثر الأسماء تكرارًا التي تبدأ بالبادئة"""
+        start = bisect_left(self.keys, prefix)
+        matches = []
+        for key in self.keys[start:]:
+            if not key.startswith(prefix):
+                break
+            matches.append(self.entries[key])
+        return heapq.nlargest(limit, matches, key=lambda entry: (entry['count'], entry['item_id']))
+
+
+class ShoppingItemSuggest(models.AbstractModel):
+    _name = 'shopping.item.suggest'
+    _description = 'Shopping item name suggestions'
+
+    @api.model
+    def suggest(self, term, limit=8):
+        """اقتراح أسماء العناصر من سجل مشتريات المستخدم مع القيم السابقة"""
+        prefix = (term or '').strip().lower()
+        if not prefix:
+            return []
+        index = self._get_index(self.env.uid)
+        with index.lock:
+            entries = [dict(entry) for entry in index.search(prefix, limit)]
+
+        categories = self.env['shopping.category'].browse(
+            {entry['category_id'] for entry in entries if entry['category_id']})
+        category_names = {category.id: category.display_name for category in categories}
+        return [{
+            'name': entry['name'],
+            'count': entry['count'],
+            'uom': entry['uom'],
+            'category_id': entry['category_id'] and (entry['category_id'], category_names.get(entry['category_id'])),
+            'estimated_price': entry['estimated_price'],
+            'store': entry['store'],
+        } for entry in entries]
+
+    @api.model
+    def _get_index(self, user_id):
+        """فهرس المستخدم من ذاكرة العامل، مع بنائه عند أول استخدام أو بعد انتهاء صلاحيته"""
+        cache_key = (self.env.cr.dbname, user_id)
+        with _indexes_lock:
+            index = _indexes.get(cache_key)
+            if index is not None and time.monotonic() - index.built_at > SUGGEST_REBUILD_SECONDS:
+                index = None
+            if index is None:
+                index = _indexes[cache_key] = _SuggestIndex()
+                new_index = True
+            else:
+                new_index = False
+            _indexes.move_to_end(cache_key)
+            while len(_indexes) > SUGGEST_MAX_USERS:
+                _indexes.popitem(last=False)
+
+        if new_index:
+            self.env['shopping.item'].flush_model(
+                ['name', 'user_id', 'bought', 'uom', 'category_id', 'estimated_price', 'store'])
+            with index.lock:
+                self._build_index(index, user_id)
+        return index
+
+    @api.model
+    def _build_index(self, index, user_id):
+        """بناء الفهرس من سجل مشتريات المستخدم باستعلام مجمع واحد"""
+        self.env.cr.execute("""
+            SELECT DISTINCT ON (lower(i.name))
+                   lower(i.name), i.name,
+                   count(*) OVER (PARTITION BY lower(i.name)),
+                   i.id, i.uom, i.category_id, i.estimated_price, i.store
+              FROM shopping_item i
+             WHERE i.user_id = %s AND i.bought
+          ORDER BY lower(i.name), i.id DESC
+        """, [user_id])
+        for row in self.env.cr.fetchall():
+            index.add(row[0].strip(), *row[1:])
+
+    @api.model
+    def _add_purchases(self, items):
+        """إضافة العناصر التي أصبحت مشتراة إلى فهارس هذا العامل بعد حفظ المعاملة"""
+        pending = self.env.cr.postcommit.data.setdefault('shopping.item.suggest.purchases', [])
+        if not pending:
+            self.env.cr.postcommit.add(partial(_apply_purchases, self.env.cr.dbname, pending))
+        pending.extend((
+            item.user_id.id, item.name.strip().lower(), item.name, 1, item.id,
+            item.uom, item.category_id.id, item.estimated_price, item.store,
+        ) for item in items if item.user_id and item.name)
+
+
+def _apply_purchases(dbname, rows):
+    """تحديث الفهارس الموجودة فقط، الفهارس غير المبنية ستقرأ المشتريات عند بنائها"""
+    for user_id, key, *values in rows:
+        with _indexes_lock:
+            index = _indexes.get((dbname, user_id))
+        if index is not None:
+            with index.lock:
+                index.add(key, *values)
@@ -0,0 +1,101 @@
+from odoo import models, fields, api
+from dateutil.relativedelta import relativedelta
+from collections import defaultdict
+
+
+# عدد القوالب المعالجة في كل دفعة من المهمة المجدولة
+TEMPLATE_BATCH_SIZE = 1000
+
+
+class ShoppingListTemplate(models.Model):
+    _name = 'shopping.list.template'
+    _description = 'Recurring shopping list template'
+    _order = 'next_date, id'
+
+    name = fields.Char(string='Template name', required=True)
+    user_id = fields.Many2one('res.users', string='user', required=True, index=True,
+                              default=lambda self: self.env.user)
+    source_list_id = fields.Many2one('shopping.list', string='Template list', required=True, ondelete='cascade')
+    active = fields.Boolean(string='Active', default=True)
+    interval_number = fields.Integer(string='Repeat every', default=1, required=True)
+    interval_type = fields.Selection([
+        ('daily', 'Days'),
+        ('weekly', 'Weeks'),
+        ('monthly', 'Months'),
+    ], string='Interval unit', default='weekly', required=True)
+    next_date = fields.Date(string='Next list date', required=True, index=True, default=fields.Date.today)
+    reset_bought_status = fields.Boolean(string='Reset Purchase Status', default=True)
+    list_ids = fields.One2many('shopping.list', 'template_id', string='Generated lists')
+
+    _sql_constraints = [
+        ('interval_positive', 'CHECK(interval_number > 0)', 'The repeat interval must be positive!'),
+    ]
+
+    def _get_next_date(self, date):
+        """حساب التاريخ التالي حسب قاعدة التكرار"""
+        self.ensure_one()
+        if self.interval_type == 'daily':
+            return date + relativedelta(days=self.interval_number)
+        elif self.interval_type == 'weekly':
+            return date + relativedelta(weeks=self.interval_number)
+        return date + relativedelta(months=self.interval_number)
+
+    @api.model
+    def _cron_generate_lists(self, batch_size=TEMPLATE_BATCH_SIZE):
+        """إنشاء كل القوائم المستحقة لجميع المستخدمين على دفعات"""
+        today = fields.Date.today()
+        last_id = 0
+        while True:
+            templates = self.search([
+                ('next_date', '<=', today),
+                ('id', '>', last_id),
+            ], order='id', limit=batch_size)
+            if not templates:
+                break
+            last_id = templates.ids[-1]
+            templates._generate_lists(today)
+            # حفظ كل دفعة حتى لا يضيع العمل المنجز عند انتهاء وقت المهمة
+            self.env.cr.commit()
+            self.env.invalidate_all()
+
+    def _generate_lists(self, today=None):
+        """إنشاء قوائم الفترة الحالية للقوالب بفحص وجود واحد وعمليات create مجمعة"""
+        today = today or fields.Date.today()
+        List = self.env['shopping.list'].with_context(mail_create_nolog=True, tracking_disable=True)
+
+        # فحص واحد للقوائم التي تم إنشاؤها مسبقًا لنفس الفترة
+        self.env['shopping.list'].flush_model(['template_id', 'period_date'])
+        self.env.cr.execute("""
+            SELECT l.template_id, l.period_date
+              FROM shopping_list l
+              JOIN unnest(%s::int[], %s::date[]) AS t(id, period_date)
+                ON l.template_id = t.id AND l.period_date = t.period_date
+        """, [self.ids, [template.next_date for template in self]])
+        existing = set(self.env.cr.fetchall())
+
+        templates = self.filtered(lambda t: (t.id, t.next_date) not in existing)
+        new_lists = List.create([{
+            'name': "{} ({})".format(template.name, template.next_date),
+            'user_id': template.user_id.id,
+            'template_id': template.id,
+            'period_date': template.next_date,
+            'notes': template.source_list_id.notes,
+            'state': 'draft',
+        } for template in templates])
+
+        pairs_by_reset = defaultdict(list)
+        for template, new_list in zip(templates, new_lists):
+            pairs_by_reset[template.reset_bought_status].append((template.source_list_id, new_list))
+        for reset_bought_status, pairs in pairs_by_reset.items():
+            List._clone_items_batch(pairs, reset_bought_status)
+
+        # تقديم تاريخ القوالب إلى أول فترة مستقبلية، مع كتابة واحدة لكل تاريخ
+        templates_by_date = defaultdict(list)
+        for template in self:
+            next_date = template._get_next_date(template.next_date)
+            while next_date <= today:
+                next_date = template._get_next_date(next_date)
+            templates_by_date[next_date].append(template.id)
+        for next_date, template_ids in templates_by_date.items():
+            self.browse(template_ids).write({'next_date': next_date})
+        return new_lists
@@ -0,0 +1,137 @@
+from odoo import models, fields, api
+from odoo.exceptions import UserError
+
+
+class ShoppingPriceUpdateRun(models.Model):
+    _name = 'shopping.price.update.run'
+    _description = 'Price update run'
+    _order = 'create_date desc'
+
+    name = fields.Char(string='Name', compute='_compute_name')
+    user_id = fields.Many2one('res.users', string='user', default=lambda self: self.env.user, readonly=True)
+    percentage = fields.Float(string='Percentage(%)', readonly=True)
+    operation = fields.Selection([
+        ('increase', 'Increase'),
+        ('decrease', 'Decrease')
+    ], string='Process', readonly=True)
+    category_id = fields.Many2one('shopping.category', string='Category', readonly=True)
+    state = fields.Selection([
+        ('applied', 'Applied'),
+        ('reverted', 'Reverted'),
+    ], string='state', default='applied', readonly=True)
+    change_ids = fields.One2many('shopping.price.change', 'run_id', string='Price changes')
+    change_count = fields.Integer(string='Changed items', readonly=True)
+    reverted_count = fields.Integer(string='Reverted items', readonly=True)
+
+    @api.depends('operation', 'percentage', 'create_date')
+    def _compute_name(self):
+        for record in self:
+            record.name = "{} {}% ({})".format(
+                dict(self._fields['operation'].selection).get(record.operation, ''),
+                record.percentage,
+                record.create_date or '')
+
+    def _get_factor(self):
+        self.ensure_one()
+        if self.operation == 'increase':
+            return 1 + self.percentage / 100
+        return 1 - self.percentage / 100
+
+    def _apply(self):
+        """تطبيق نسبة التغيير على الأسعار بتحديث واحد لكل فئة مع تسجيل كل تغيير"""
+        self.ensure_one()
+        Item = self.env['shopping.item']
+        Item.flush_model(['estimated_price', 'bought', 'category_id', 'list_id'])
+
+        if self.category_id:
+            category_ids = [self.category_id.id]
+        else:
+            self.env.cr.execute("""
+                SELECT DISTINCT category_id
+                  FROM shopping_item
+                 WHERE bought IS NOT TRUE AND coalesce(estimated_price, 0) != 0
+            """)
+            category_ids = [row[0] for row in self.env.cr.fetchall()]
+
+        list_ids = set()
+        count = 0
+        for category_id in category_ids:
+            self.env.cr.execute("""
+                WITH changed AS (
+                    UPDATE shopping_item i
+                       SET estimated_price = old.estimated_price * %(factor)s,
+                           write_uid = %(uid)s,
+                           write_date = now() at time zone 'UTC'
+                      FROM shopping_item old
+                     WHERE old.id = i.id
+                       AND i.bought IS NOT TRUE
+                       AND coalesce(i.estimated_price, 0) != 0
+                       AND i.category_id IS NOT DISTINCT FROM %(category_id)s
+                 RETURNING i.id, i.list_id, old.estimated_price AS old_price, i.estimated_price AS new_price
+                ), logged AS (
+                    INSERT INTO shopping_price_change (run_id, item_id, old_price, new_price)
+                         SELECT %(run_id)s, id, old_price, new_price FROM changed
+                )
+                SELECT list_id, count(*) FROM changed GROUP BY list_id
+            """, {
+                'factor': self._get_factor(),
+                'uid': self.env.uid,
+                'category_id': category_id,
+                'run_id': self.id,
+            })
+            for list_id, list_count in self.env.cr.fetchall():
+                count += list_count
+                if list_id:
+                    list_ids.add(list_id)
+
+        self._after_price_sql_update(list_ids)
+        self.change_count = count
+        return count
+
+    def action_revert(self):
+        """استرجاع الأسعار السابقة للتشغيل بتحديث واحد
+
+        العناصر التي تغير سعرها بعد التشغيل لا يتم استرجاعها.
+        """
+        self.ensure_one()
+        if self.state == 'reverted':
+            raise UserError("This price update has already been reverted.")
+        self.env['shopping.item'].flush_model(['estimated_price'])
+        self.env.cr.execute("""
+            WITH reverted AS (
+                UPDATE shopping_item i
+                   SET estimated_price = c.old_price,
+                       write_uid = %(uid)s,
+                       write_date = now() at time zone 'UTC'
+                  FROM shopping_price_change c
+                 WHERE c.run_id = %(run_id)s
+                   AND c.item_id = i.id
+                   AND i.estimated_price = c.new_price
+             RETURNING i.list_id
+            )
+            SELECT list_id, count(*) FROM reverted GROUP BY list_id
+        """, {'uid': self.env.uid, 'run_id': self.id})
+        rows = self.env.cr.fetchall()
+        self._after_price_sql_update({list_id for list_id, _count in rows if list_id})
+        self.write({
+            'state': 'reverted',
+            'reverted_count': sum(row_count for _list_id, row_count in rows),
+        })
+
+    @api.model
+    def _after_price_sql_update(self, list_ids):
+        """تحديث الذاكرة المؤقتة وعدادات القوائم بعد التعديل المباشر على الأسعار"""
+        self.env['shopping.item'].invalidate_model(['estimated_price', 'total_estimated', 'write_uid', 'write_date'])
+        self.env['shopping.list'].browse(list_ids)._recompute_item_counters()
+        self.env['shopping.report.cache']._bump_data_version()
+
+
+class ShoppingPriceChange(models.Model):
+    _name = 'shopping.price.change'
+    _description = 'Price change'
+    _log_access = False
+
+    run_id = fields.Many2one('shopping.price.update.run', string='Run', required=True, ondelete='cascade', index=True)
+    item_id = fields.Many2one('shopping.item', string='Item', required=True, ondelete='cascade', index=True)
+    old_price = fields.Float(string='Old price')
+    new_price = fields.Float(string='New price')
@@ -0,0 +1,99 @@
+from odoo import models, api
+from collections import OrderedDict
+import copy
+import json
+import psycopg2
+import threading
+
+
+# الحد الأقصى لعدد نتائج التقارير المحفوظة في ذاكرة كل عامل
+REPORT_CACHE_MAX_ENTRIES = 128
+# دمج سجل التعديلات في صف واحد بعد كل هذا العدد من المعاملات
+REPORT_CACHE_COMPACT_EVERY = 1000
+
+_results = OrderedDict()
+_results_lock = threading.Lock()
+
+
+class ShoppingReportCache(models.AbstractModel):
+    _name = 'shopping.report.cache'
+    _description = 'Shopping report result cache'
+
+    def init(self):
+        # سجل التعديلات: كل معاملة تعدل البيانات تضيف صفًا، ورقم الإصدار هو مجموع الصفوف
+        # المرئية في لقطة القارئ، فيُقرأ في نفس لقطة البيانات التي يُحسب منها التقرير.
+        # الإضافة فقط بدل تحديث صف عداد واحد حتى لا تتعارض معاملات الكتابة المتزامنة
+        self.env.cr.execute("""
+            CREATE TABLE IF NOT EXISTS shopping_report_data_change (
+                id bigserial PRIMARY KEY,
+                changes bigint NOT NULL DEFAULT 1
+            )
+        """)
+        self.env.cr.execute("DROP SEQUENCE IF EXISTS shopping_report_data_version")
+
+    @api.model
+    def _get_or_compute(self, report_type, filters, compute):
+        """نتيجة التقرير من الذاكرة إذا لم تتغير البيانات منذ حسابها، وإلا حسابها وحفظها
+
+        المفتاح يتكون من نوع التقرير والفلاتر بعد توحيدها ورقم إصدار البيانات،
+        لذلك لا يتم إرجاع نتيجة قديمة بعد أي تعديل على العناصر أو الميزانيات.
+        """
+        # المعاملة التي عدلت البيانات ترى تعديلاتها غير المحفوظة فلا تستخدم الذاكرة المشتركة
+        if self._is_dirty():
+            return compute()
+
+        self.env.cr.execute("SELECT coalesce(sum(changes), 0)::bigint FROM shopping_report_data_change")
+        version = self.env.cr.fetchone()[0]
+        key = (
+            self.env.cr.dbname,
+            report_type,
+            self.env.lang,
+            json.dumps(filters, sort_keys=True, default=str),
+            version,
+        )
+        with _results_lock:
+            result = _results.get(key)
+            if result is not None:
+                _results.move_to_end(key)
+                return copy.deepcopy(result)
+
+        result = compute()
+        with _results_lock:
+            _results[key] = copy.deepcopy(result)
+            while len(_results) > REPORT_CACHE_MAX_ENTRIES:
+                _results.popitem(last=False)
+        return result
+
+    @api.model
+    def _bump_data_version(self):
+        """إبطال نتائج التقارير بعد تعديل البيانات
+
+        الصف المضاف يصبح مرئيًا مع التعديلات نفسها عند الحفظ، لذلك لا يمكن لقارئ
+        أن يرى الإصدار الجديد مع البيانات القديمة.
+        """
+        if self._is_dirty():
+            return
+        self.env.cr.postcommit.data['shopping.report.cache.dirty'] = True
+        self.env.cr.execute("INSERT INTO shopping_report_data_change DEFAULT VALUES RETURNING id")
+        if self.env.cr.fetchone()[0] % REPORT_CACHE_COMPACT_EVERY == 0:
+            self._compact_changes()
+
+    @api.model
+    def _compact_changes(self):
+        """استبدال الصفوف المرئية بصف واحد يحمل مجموعها دون تغيير رقم الإصدار"""
+        try:
+            with self.env.cr.savepoint(flush=False):
+                self.env.cr.execute("""
+                    WITH removed AS (
+                        DELETE FROM shopping_report_data_change RETURNING changes
+                    )
+                    INSERT INTO shopping_report_data_change (changes)
+                         SELECT sum(changes) FROM removed
+                """)
+        except psycopg2.errors.SerializationFailure:
+            # دمج متزامن من معاملة أخرى، سيتم الدمج مرة أخرى لاحقًا
+            pass
+
+    @api.model
+    def _is_dirty(self):
+        return self.env.cr.postcommit.data.get('shopping.report.cache.dirty', False)
@@ -0,0 +1,156 @@
+from odoo import models, fields, api
+from odoo.exceptions import UserError
+import csv
+import io
+import json
+import logging
+import time
+from datetime import timedelta
+
+_logger = logging.getLogger(__name__)
+
+# الحد الأقصى لمدة تشغيل المهمة المجدولة بالثواني قبل ترك باقي التقارير للتشغيل التالي
+REPORT_JOB_TIME_LIMIT = 240
+
+
+class ShoppingReportJob(models.Model):
+    _name = 'shopping.report.job'
+    _inherit = ['mail.thread']
+    _description = 'Shopping background report'
+    _order = 'create_date desc'
+
+    name = fields.Char(string='Name', required=True)
+    user_id = fields.Many2one('res.users', string='user', required=True, default=lambda self: self.env.user)
+    report_model = fields.Char(string='Report', required=True, readonly=True)
+    report_params = fields.Text(string='Report options', readonly=True)
+    state = fields.Selection([
+        ('pending', 'Pending'),
+        ('running', 'Running'),
+        ('done', 'Done'),
+        ('failed', 'Failed'),
+    ], string='state', default='pending', required=True, index=True, tracking=True)
+    csv_attachment_id = fields.Many2one('ir.attachment', string='CSV result', readonly=True)
+    json_attachment_id = fields.Many2one('ir.attachment', string='JSON result', readonly=True)
+    processing_time = fields.Float(string='Processing time (s)', readonly=True)
+    error_log = fields.Text(string='Errors', readonly=True)
+    date_started = fields.Datetime(string='Started on', readonly=True)
+    date_finished = fields.Datetime(string='Finished on', readonly=True)
+
+    @api.model
+    def _create_for_wizard(self, wizard, name):
+        """إنشاء مهمة لتقرير معالج بنفس خيارات المعالج"""
+        vals = wizard.copy_data({'run_in_background': False})[0]
+        job = self.create({
+            'name': name,
+            'report_model': wizard._name,
+            'report_params': json.dumps(vals, default=str),
+        })
+        job._trigger_processing()
+        return job
+
+    def action_retry(self):
+        stale_jobs = self.filtered_domain(self._get_stale_domain())
+        if (self - stale_jobs).filtered(lambda job: job.state != 'failed'):
+            raise UserError("Only failed or interrupted reports can be retried.")
+        self.write({'state': 'pending', 'error_log': False})
+        self._trigger_processing()
+
+    @api.model
+    def _trigger_processing(self):
+        cron = self.env.ref('Shopping_List.ir_cron_process_report_jobs', raise_if_not_found=False)
+        if cron:
+            cron._trigger()
+
+    @api.model
+    def _get_stale_domain(self):
+        """مهام بقيت قيد التشغيل بعد الوقت المتاح، أي توقف العامل الذي كان يحسبها"""
+        return [
+            ('state', '=', 'running'),
+            ('date_started', '<', fields.Datetime.now() - timedelta(seconds=REPORT_JOB_TIME_LIMIT)),
+        ]
+
+    @api.model
+    def _get_processable_domain(self):
+        return ['|', ('state', '=', 'pending'), '&'] + self._get_stale_domain()
+
+    @api.model
+    def _cron_process_jobs(self, time_limit=REPORT_JOB_TIME_LIMIT):
+        """حساب التقارير المعلقة والمتوقفة حتى انتهاء الوقت المتاح"""
+        deadline = time.monotonic() + time_limit
+        while time.monotonic() < deadline:
+            job = self.search(self._get_processable_domain(), order='id', limit=1)
+            if not job:
+                return
+            job._process()
+        # بقيت تقارير معلقة: المتابعة في تشغيل جديد
+        if self.search_count(self._get_processable_domain(), limit=1):
+            self._trigger_processing()
+
+    def _process(self):
+        """حساب التقرير بصلاحيات صاحبه وحفظ النتيجة كمرفقات CSV و JSON"""
+        self.ensure_one()
+        self.write({'state': 'running', 'date_started': fields.Datetime.now()})
+        self.env.cr.commit()
+
+        started = time.monotonic()
+        try:
+            wizard = self.env[self.report_model].with_user(self.user_id).create(json.loads(self.report_params))
+            data = wizard._collect_data()
+            attachments = self._create_result_attachments(wizard._get_report_csv(data), data)
+        except Exception as e:
+            _logger.exception("Shopping report job %s failed", self.id)
+            self.env.cr.rollback()
+            self.write({
+                'state': 'failed',
+                'error_log': "Report error: {}".format(e),
+                'processing_time': time.monotonic() - started,
+                'date_finished': fields.Datetime.now(),
+            })
+            self._notify_user("Report failed", "The report {} could not be generated.".format(self.name), 'danger')
+            self.env.cr.commit()
+            return
+
+        self.write({
+            'state': 'done',
+            'csv_attachment_id': attachments[0].id,
+            'json_attachment_id': attachments[1].id,
+            'processing_time': time.monotonic() - started,
+            'date_finished': fields.Datetime.now(),
+        })
+        self._notify_user("Report ready", "The report {} is ready.".format(self.name), 'success', attachments)
+        self.env.cr.commit()
+
+    def _create_result_attachments(self, rows, data):
+        """مرفق CSV للجدول ومرفق JSON للبيانات الكاملة"""
+        self.ensure_one()
+        buffer = io.StringIO()
+        csv.writer(buffer).writerows(rows)
+        return self.env['ir.attachment'].create([{
+            'name': '{}.csv'.format(self.name),
+            'raw': buffer.getvalue().encode('utf-8-sig'),
+            'mimetype': 'text/csv',
+            'res_model': self._name,
+            'res_id': self.id,
+        }, {
+            'name': '{}.json'.format(self.name),
+            'raw': json.dumps(data, default=str).encode('utf-8'),
+            'mimetype': 'application/json',
+            'res_model': self._name,
+            'res_id': self.id,
+        }])
+
+    def _notify_user(self, title, message, notification_type, attachments=None):
+        """إشعار صاحب التقرير في سجل المهمة وعبر الـ bus"""
+        self.ensure_one()
+        self.message_post(
+            body=message,
+            attachment_ids=attachments.ids if attachments else [],
+            partner_ids=self.user_id.partner_id.ids,
+            subtype_xmlid='mail.mt_comment',
+        )
+        self.env['bus.bus']._sendone(self.user_id.partner_id, 'simple_notification', {
+            'title': title,
+            'message': message,
+            'type': notification_type,
+            'sticky': False,
+        })
@@ -1,10 +1,28 @@
-from odoo import models, fields, api
+from odoo import models, fields, api, tools
+from collections import defaultdict, namedtuple
+
+
+ItemState = namedtuple('ItemState', [
+    'list_id', 'user_id', 'bought', 'date_bought', 'priority', 'category_id',
+    'quantity', 'estimated_price', 'actual_price',
+])
+
+
+def _budget_key(state):
+    """القيم التي تؤثر على مصروف الميزانيات"""
+    return (state.bought, state.date_bought, state.quantity, state.actual_price, state.category_id, state.user_id)
+
+
+# ترتيب الأولويات كرقم صحيح: الترتيب النصي لقيم الاختيار يعطي medium, low, high
+PRIORITY_RANKS = {'high': 0, 'medium': 1, 'low': 2}
+# العناصر بدون أولوية تأتي بعد الأولوية المنخفضة
+PRIORITY_RANK_NONE = 3
 
 
 class ShoppingItem(models.Model):
     _name = 'shopping.item'
     _description = 'shopping item'
-    _order = 'priority desc, create_date'
+    _order = 'priority_rank, create_date, id'
 
     name = fields.Char(string='item name', required=True)
     quantity = fields.Float(string='Quantity', default=1.0)
@@ -24,6 +42,7 @@ class ShoppingItem(models.Model):
         ('medium', 'Medium'),
         ('low', 'Low')
     ], string='Priority', default='medium')
+    priority_rank = fields.Integer(string='Priority rank', compute='_compute_priority_rank', store=True)
 
     estimated_price = fields.Float(string='Estimated Price')
     actual_price = fields.Float(string='Actual Price')
@@ -33,6 +52,9 @@ class ShoppingItem(models.Model):
     date_bought = fields.Datetime(string='Purchase date')
 
     list_id = fields.Many2one('shopping.list', string='shopping list', ondelete='cascade')
+    # مالك القائمة مخزن على العنصر لتجنب الربط مع القوائم في الاستعلامات لكل مستخدم
+    # بدون index: الفهرس المركب (user_id, bought, date_bought) يبدأ بنفس العمود
+    user_id = fields.Many2one('res.users', string='Owner', related='list_id.user_id', store=True)
     notes = fields.Text(string='Notes')
 
     image = fields.Binary(string='Image')
@@ -47,10 +69,131 @@ class ShoppingItem(models.Model):
             record.total_estimated = record.quantity * (record.estimated_price or 0)
             record.total_actual = record.quantity * (record.actual_price or 0)
 
-    def action_toggle_bought(self):
+    @api.depends('priority')
+    def _compute_priority_rank(self):
         for record in self:
-            record.bought = not record.bought
-            if record.bought:
-                record.date_bought = fields.Datetime.now()
+            record.priority_rank = PRIORITY_RANKS.get(record.priority, PRIORITY_RANK_NONE)
+
+    def init(self):
+        # الفهرس الأحادي على user_id من الإصدار السابق زائد ويضيف كلفة على كل إضافة
+        self._cr.execute("DROP INDEX IF EXISTS shopping_item_user_id_index")
+        # فهارس مركبة لأكثر الفلاتر استخدامًا في لوحة التحكم والميزانيات والتقارير
+        tools.create_index(self._cr, 'shopping_item_user_bought_date_index',
+                           self._table, ['user_id', 'bought', 'date_bought'])
+        tools.create_index(self._cr, 'shopping_item_list_bought_index',
+                           self._table, ['list_id', 'bought'])
+        tools.create_index(self._cr, 'shopping_item_category_date_index',
+                           self._table, ['category_id', 'date_bought'])
+        # يطابق الترتيب الافتراضي لتصفح عناصر القائمة بمسح الفهرس بدل الفرز في الذاكرة
+        tools.create_index(self._cr, 'shopping_item_list_priority_rank_index',
+                           self._table, ['list_id', 'priority_rank', 'create_date', 'id'])
+
+    # الحقول التي تؤثر على عدادات القوائم ولوحة التحكم
+    _AGGREGATE_FIELDS = {
+        'list_id', 'bought', 'date_bought', 'priority', 'category_id',
+        'quantity', 'estimated_price', 'actual_price',
+    }
+
+    @api.model_create_multi
+    def create(self, vals_list):
+        items = super().create(vals_list)
+        items._propagate_aggregates({}, items._get_aggregate_snapshot())
+        return items
+
+    def write(self, vals):
+        if 'store' in vals:
+            # المتجر لا يؤثر على العدادات لكنه يؤثر على نتائج التقارير
+            self.env['shopping.report.cache']._bump_data_version()
+        if self._AGGREGATE_FIELDS.isdisjoint(vals):
+            return super().write(vals)
+        before = self._get_aggregate_snapshot()
+        res = super().write(vals)
+        self._propagate_aggregates(before, self._get_aggregate_snapshot())
+        return res
+
+    def unlink(self):
+        before = self._get_aggregate_snapshot()
+        res = super().unlink()
+        self.browse()._propagate_aggregates(before, {})
+        return res
+
+    def _get_aggregate_snapshot(self):
+        """لقطة من القيم المؤثرة على التجميعات لكل عنصر"""
+        return {item.id: ItemState(
+            list_id=item.list_id.id,
+            user_id=item.user_id.id,
+            bought=item.bought,
+            date_bought=item.date_bought,
+            priority=item.priority,
+            category_id=item.category_id.id,
+            quantity=item.quantity,
+            estimated_price=item.estimated_price,
+            actual_price=item.actual_price,
+        ) for item in self}
+
+    @api.model
+    def _propagate_aggregates(self, before, after):
+        """نشر فروقات العناصر على عدادات القوائم ولوحة التحكم"""
+        changed = [
+            (before.get(item_id), after.get(item_id))
+            for item_id in set(before) | set(after)
+            if before.get(item_id) != after.get(item_id)
+        ]
+        if not changed:
+            return
+
+        # الفروقات لكل قائمة: [عدد العناصر، المكتملة، الميزانية، المصروف]
+        deltas = defaultdict(lambda: [0, 0, 0.0, 0.0])
+        user_ids = set()
+        for old, new in changed:
+            for sign, state in ((-1, old), (1, new)):
+                if not state:
+                    continue
+                user_ids.add(state.user_id)
+                if not state.list_id:
+                    continue
+                price = state.estimated_price or 0.0
+                delta = deltas[state.list_id]
+                delta[0] += sign
+                delta[2] += sign * price
+                if state.bought:
+                    delta[1] += sign
+                    delta[3] += sign * price
+
+        self.env['shopping.list']._apply_item_deltas(deltas)
+        budgets = self._get_affected_budgets(changed)
+        budgets._invalidate_actual_spent()
+        # التنبيه فقط للميزانيات التي تغطي عمليات الشراء المتغيرة، دون إعادة فحص كل الميزانيات
+        budgets._check_alerts()
+        self.env['shopping.dashboard']._bump_dashboard_versions(user_ids)
+        self.env['shopping.report.cache']._bump_data_version()
+
+        # العناصر التي دخلت سجل المشتريات تُضاف إلى فهارس الاقتراحات بعد الحفظ
+        purchased_ids = [
+            item_id for item_id, state in after.items()
+            if state.bought and not (before.get(item_id) and before[item_id].bought)
+        ]
+        if purchased_ids:
+            self.env['shopping.item.suggest']._add_purchases(self.browse(purchased_ids))
+
+    @api.model
+    def _get_affected_budgets(self, changed):
+        """الميزانيات التي تغطي عمليات الشراء التي تغيرت"""
+        purchases = set()
+        for old, new in changed:
+            if old and new and _budget_key(old) == _budget_key(new):
+                continue
+            for state in (old, new):
+                if state and state.bought and state.date_bought:
+                    purchases.add((state.date_bought.date(), state.category_id, state.user_id))
+        return self.env['shopping.budget']._find_covering_budgets(purchases)
+
+    def action_toggle_bought(self):
+        # كتابة واحدة لكل حالة حتى يتم تقييم الميزانيات والتنبيهات مرة واحدة
+        to_buy = self.filtered(lambda record: not record.bought)
+        if to_buy:
+            to_buy.write({'bought': True, 'date_bought': fields.Datetime.now()})
+        if self - to_buy:
+            (self - to_buy).write({'bought': False})
 
 
@@ -1,6 +1,7 @@
 from odoo import models, fields, api
 from odoo.exceptions import UserError
 from datetime import datetime, timedelta
+from collections import defaultdict
 
 
 class ShoppingList(models.Model):
@@ -20,31 +21,126 @@ class ShoppingList(models.Model):
     ], string='state', default='draft', tracking=True)
 
     item_ids = fields.One2many('shopping.item', 'list_id', string='Items')
-    total_items = fields.Integer(string='total items', compute='_compute_totals')
-    completed_items = fields.Integer(string='Completed elements', compute='_compute_totals')
-    completion_rate = fields.Float(string='Completion rate', compute='_compute_totals')
+    # عدادات مخزنة يتم تحديثها تدريجيًا من فروقات العناصر
+    total_items = fields.Integer(string='total items', default=0, readonly=True, copy=False, index=True)
+    completed_items = fields.Integer(string='Completed elements', default=0, readonly=True, copy=False, index=True)
+    completion_rate = fields.Float(string='Completion rate', default=0.0, readonly=True, copy=False, index=True)
 
-    total_budget = fields.Float(string='Total budget', compute='_compute_budget')
-    actual_spent = fields.Float(string='Actual expenditure', compute='_compute_budget')
-    budget_variance = fields.Float(string='variance', compute='_compute_budget')
+    total_budget = fields.Float(string='Total budget', default=0.0, readonly=True, copy=False, index=True)
+    actual_spent = fields.Float(string='Actual expenditure', default=0.0, readonly=True, copy=False, index=True)
+    budget_variance = fields.Float(string='variance', default=0.0, readonly=True, copy=False, index=True)
 
     notes = fields.Text(string='notes')
     color = fields.Integer(string='mark color')
 
-    @api.depends('item_ids', 'item_ids.bought')
-    def _compute_totals(self):
-        for record in self:
-            record.total_items = len(record.item_ids)
-            record.completed_items = len(record.item_ids.filtered(lambda x: x.bought))
-            record.completion_rate = (
-                        record.completed_items / record.total_items * 100) if record.total_items > 0 else 0
+    # القوائم المتكررة
+    template_id = fields.Many2one('shopping.list.template', string='Template', index=True, copy=False,
+                                  ondelete='set null')
+    period_date = fields.Date(string='Period', copy=False)
 
-    @api.depends('item_ids', 'item_ids.estimated_price', 'item_ids.bought')
-    def _compute_budget(self):
-        for record in self:
-            record.total_budget = sum(record.item_ids.mapped('estimated_price'))
-            record.actual_spent = sum(record.item_ids.filtered(lambda x: x.bought).mapped('estimated_price'))
-            record.budget_variance = record.total_budget - record.actual_spent
+    _sql_constraints = [
+        ('template_period_uniq', 'unique(template_id, period_date)',
+         'A recurring template can only generate one list per period!'),
+    ]
+
+    _COUNTER_FIELDS = [
+        'total_items', 'completed_items', 'completion_rate',
+        'total_budget', 'actual_spent', 'budget_variance',
+    ]
+
+    @api.model
+    def _apply_item_deltas(self, deltas):
+        """تطبيق فروقات العناصر على عدادات القوائم بتحديث واحد
+
+        deltas: {list_id: [عدد العناصر، المكتملة، الميزانية، المصروف]}
+        """
+        deltas = {list_id: delta for list_id, delta in deltas.items() if list_id and any(delta)}
+        if not deltas:
+            return
+        list_ids = sorted(deltas)
+        self.env.cr.execute("""
+            UPDATE shopping_list l
+               SET total_items = coalesce(l.total_items, 0) + d.items,
+                   completed_items = coalesce(l.completed_items, 0) + d.completed,
+                   completion_rate = CASE
+                        WHEN coalesce(l.total_items, 0) + d.items > 0
+                        THEN (coalesce(l.completed_items, 0) + d.completed) * 100.0
+                             / (coalesce(l.total_items, 0) + d.items)
+                        ELSE 0 END,
+                   total_budget = coalesce(l.total_budget, 0) + d.budget,
+                   actual_spent = coalesce(l.actual_spent, 0) + d.spent,
+                   budget_variance = (coalesce(l.total_budget, 0) + d.budget)
+                                     - (coalesce(l.actual_spent, 0) + d.spent)
+              FROM unnest(%s::int[], %s::int[], %s::int[], %s::float8[], %s::float8[])
+                   AS d(id, items, completed, budget, spent)
+             WHERE l.id = d.id
+        """, [
+            list_ids,
+            [deltas[list_id][0] for list_id in list_ids],
+            [deltas[list_id][1] for list_id in list_ids],
+            [deltas[list_id][2] for list_id in list_ids],
+            [deltas[list_id][3] for list_id in list_ids],
+        ])
+        self.invalidate_model(self._COUNTER_FIELDS)
+
+    def _recompute_item_counters(self):
+        """إعادة حساب عدادات القوائم بالكامل باستعلام مجمع واحد"""
+        if not self.ids:
+            return
+        self.env['shopping.item'].flush_model(['list_id', 'bought', 'estimated_price'])
+        self.env.cr.execute("""
+            WITH s AS (
+                SELECT l.id,
+                       count(i.id) AS items,
+                       count(i.id) FILTER (WHERE i.bought) AS completed,
+                       coalesce(sum(i.estimated_price), 0) AS budget,
+                       coalesce(sum(i.estimated_price) FILTER (WHERE i.bought), 0) AS spent
+                  FROM shopping_list l
+             LEFT JOIN shopping_item i ON i.list_id = l.id
+                 WHERE l.id IN %s
+              GROUP BY l.id
+            )
+            UPDATE shopping_list l
+               SET total_items = s.items,
+                   completed_items = s.completed,
+                   completion_rate = CASE WHEN s.items > 0 THEN s.completed * 100.0 / s.items ELSE 0 END,
+                   total_budget = s.budget,
+                   actual_spent = s.spent,
+                   budget_variance = s.budget - s.spent
+              FROM s
+             WHERE l.id = s.id
+        """, [tuple(self.ids)])
+        self.invalidate_recordset(self._COUNTER_FIELDS)
+
+    # الحقول التي تؤثر على لوحة التحكم
+    _DASHBOARD_FIELDS = {'name', 'state', 'user_id'}
+
+    @api.model_create_multi
+    def create(self, vals_list):
+        lists = super().create(vals_list)
+        self.env['shopping.dashboard']._bump_dashboard_versions(lists.user_id.ids)
+        return lists
+
+    def write(self, vals):
+        if self._DASHBOARD_FIELDS.isdisjoint(vals):
+            return super().write(vals)
+        user_ids = set(self.user_id.ids)
+        # تغيير المالك ينقل مشتريات القائمة إلى ميزانيات مستخدم آخر
+        items = self.item_ids if 'user_id' in vals else self.env['shopping.item']
+        before = items._get_aggregate_snapshot()
+        res = super().write(vals)
+        items._propagate_aggregates(before, items._get_aggregate_snapshot())
+        user_ids.update(self.user_id.ids)
+        self.env['shopping.dashboard']._bump_dashboard_versions(user_ids)
+        return res
+
+    def unlink(self):
+        user_ids = self.user_id.ids
+        # حذف العناصر عبر ORM لتحديث الميزانيات قبل الحذف المتتالي
+        self.item_ids.unlink()
+        res = super().unlink()
+        self.env['shopping.dashboard']._bump_dashboard_versions(user_ids)
+        return res
 
     def action_mark_in_progress(self):
         self.write({'state': 'in_progress'})
@@ -56,21 +152,65 @@ class ShoppingList(models.Model):
         self.write({'state': 'cancelled'})
 
     def action_duplicate_list(self):
+        new_lists = self.browse()
         for record in self:
-            new_list = record.copy(default={
+            new_lists |= record.copy(default={
                 'name': "{} (copy)".format(record.name),
                 'state': 'draft'
             })
-            # نسخ العناصر
-            for item in record.item_ids:
-                item.copy(default={
-                    'list_id': new_list.id,
-                    'bought': False
-                })
+        # نسخ العناصر لكل القوائم بعملية واحدة
+        self._clone_items_batch(list(zip(self, new_lists)), reset_bought_status=True)
         return {
             'type': 'ir.actions.act_window',
             'res_model': 'shopping.list',
-            'res_id': new_list.id,
+            'res_id': new_lists[-1:].id,
             'view_mode': 'form',
             'target': 'current',
-        }
\ No newline at end of file
+        }
+
+    # حقول العناصر المنسوخة عند استنساخ قائمة
+    _CLONE_ITEM_FIELDS = [
+        'name', 'quantity', 'uom', 'category_id', 'priority', 'estimated_price',
+        'actual_price', 'store', 'bought', 'date_bought', 'notes', 'image',
+    ]
+
+    @api.model
+    def _clone_items_batch(self, pairs, reset_bought_status=True):
+        """نسخ عناصر القوائم المصدر إلى القوائم الهدف بعملية create واحدة
+
+        pairs: قائمة من (القائمة المصدر، القائمة الهدف)، ويمكن تكرار المصدر لعدة أهداف
+        """
+        if not pairs:
+            return self.env['shopping.item']
+        source_ids = list({source.id for source, _target in pairs})
+        items_by_list = defaultdict(list)
+        for item in self.env['shopping.item'].search_read(
+                [('list_id', 'in', source_ids)], self._CLONE_ITEM_FIELDS + ['list_id'], load=False):
+            items_by_list[item.pop('list_id')].append(item)
+
+        vals_list = []
+        for source, target in pairs:
+            for item in items_by_list[source.id]:
+                vals = dict(item, list_id=target.id)
+                vals.pop('id')
+                if reset_bought_status:
+                    vals['bought'] = False
+                vals_list.append(vals)
+        return self.env['shopping.item'].create(vals_list)
+
+    def _clone_items_to(self, target_lists, reset_bought_status=True):
+        """نسخ عناصر هذه القائمة إلى عدة قوائم هدف في استدعاء واحد"""
+        self.ensure_one()
+        return self._clone_items_batch([(self, target) for target in target_lists], reset_bought_status)
+
+    def _clone_for_users(self, users, name=None, copy_items=True, reset_bought_status=True):
+        """استنساخ القائمة لكل مستخدم (مثل أفراد الأسرة) بعمليتي create فقط"""
+        self.ensure_one()
+        vals = self.copy_data(default={
+            'name': name or "{} (copy)".format(self.name),
+            'state': 'draft',
+        })[0]
+        new_lists = self.create([dict(vals, user_id=user.id) for user in users])
+        if copy_items:
+            self._clone_items_to(new_lists, reset_bought_status)
+        return new_lists
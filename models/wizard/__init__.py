@@ -7,4 +7,5 @@ from . import bulk_operations_wizard
 from . import quick_add_items
 from . import copy_shopping_list
 from . import update_prices
-from . import budget_report
\ No newline at end of file
+from . import budget_report
+from . import category_restructure_wizard
@@ -3,6 +3,13 @@ from odoo.exceptions import UserError
 from datetime import datetime, timedelta
 
 
+# عدد الأشهر التي يغطيها التوقع لكل فترة، ونسبة الفترة من هذه الأشهر
+PERIOD_FORECAST_MONTHS = {'weekly': 1, 'monthly': 1, 'quarterly': 3, 'yearly': 12}
+PERIOD_FORECAST_FACTOR = {'weekly': 12 / 52}
+# مدة الإنفاق التاريخي المعروض في سطور الفئات
+HISTORICAL_SPENDING_DAYS = 90
+
+
 class BudgetPlanningWizard(models.TransientModel):
     _name = 'shopping.budget.planning.wizard'
     _description = 'Budget Planning Wizard'
@@ -34,17 +41,42 @@ class BudgetPlanningWizard(models.TransientModel):
     reference_months = fields.Integer(string='Reference months number' , default=3)
 
     @api.model
-    def default_get(self, fields):
-        res = super().default_get(fields)
-        if 'category_budgets' in fields:
-            # تعبئة تلقائية بالفئات الموجودة
-            categories = self.env['shopping.category'].search([])
-            res['category_budgets'] = [(0, 0, {
-                'category_id': category.id,
-                'allocated_amount': 0.0,
-            }) for category in categories]
+    def default_get(self, fields_list):
+        res = super().default_get(fields_list)
+        if 'category_budgets' in fields_list:
+            # تعبئة تلقائية بالفئات الموجودة مع المبلغ المقترح من التوقع
+            allocations = self._get_suggested_allocations(
+                fields.Date.to_date(res.get('start_date')) or fields.Date.today(),
+                res.get('period') or 'monthly')
+            res['category_budgets'] = self._prepare_budget_lines(allocations)
+            if 'budget_amount' in fields_list and not res.get('budget_amount'):
+                res['budget_amount'] = sum(allocations.values())
         return res
 
+    @api.model
+    def _get_suggested_allocations(self, start_date, period, based_on='history', reference_months=3):
+        """المبالغ المقترحة لكل فئة للفترة من توقع المصروف الشهري للمستخدم الحالي"""
+        Forecast = self.env['shopping.budget.forecast']
+        month_start = start_date.replace(day=1)
+        months = PERIOD_FORECAST_MONTHS.get(period, 1)
+        if based_on == 'average':
+            averages = Forecast.monthly_average(month_start, max(reference_months, 1), self.env.uid)
+            allocations = {category_id: amount * months for category_id, amount in averages.items()}
+        else:
+            allocations = Forecast.forecast(month_start, months, self.env.uid)
+        factor = PERIOD_FORECAST_FACTOR.get(period, 1)
+        return {category_id: round(amount * factor, 2)
+                for category_id, amount in allocations.items() if category_id}
+
+    @api.model
+    def _prepare_budget_lines(self, allocations):
+        """سطور كل الفئات مع المبالغ المقترحة"""
+        categories = self.env['shopping.category'].search([])
+        return [(0, 0, {
+            'category_id': category.id,
+            'allocated_amount': allocations.get(category.id, 0.0),
+        }) for category in categories]
+
     def action_generate_budget(self):
         """إنشاء ميزانية بناءً على الإعدادات"""
         self.ensure_one()
@@ -110,24 +142,15 @@ class BudgetPlanningWizard(models.TransientModel):
         }
 
     def _generate_automatic_budget(self):
-        """إنشاء ميزانية تلقائية بناءً على البيانات التاريخية"""
-        # حساب متوسط الإنفاق بناءً على السجل التاريخي
-        end_date = self.start_date
-        start_date = end_date - timedelta(days=30 * self.reference_months)
-
-        items = self.env['shopping.item'].search([
-            ('bought', '=', True),
-            ('date_bought', '>=', start_date),
-            ('date_bought', '<=', end_date),
-        ])
-
-        total_spent = sum(items.mapped('total_actual'))
-        average_monthly = total_spent / self.reference_months
-
-        # اقتراح ميزانية بناءً على المتوسط
-        suggested_budget = average_monthly * 1.1  # زيادة 10% عن المتوسط
-
-        self.budget_amount = suggested_budget
+        """إنشاء ميزانية تلقائية بناءً على توقع الإنفاق لكل فئة"""
+        allocations = self._get_suggested_allocations(
+            self.start_date, self.period, self.auto_based_on, self.reference_months)
+        suggested_budget = sum(allocations.values())
+
+        self.write({
+            'budget_amount': suggested_budget,
+            'category_budgets': [(5, 0, 0)] + self._prepare_budget_lines(allocations),
+        })
 
         return {
             'type': 'ir.actions.act_window',
@@ -161,16 +184,21 @@ class CategoryBudgetLine(models.TransientModel):
     historical_spending = fields.Float(string='Historic spending', compute='_compute_historical_spending')
 
     def _compute_historical_spending(self):
-        """حساب الإنفاق التاريخي للفئة"""
+        """حساب الإنفاق التاريخي لكل الفئات في استعلام واحد"""
+        category_ids = tuple(set(self.category_id.ids))
+        spent = {}
+        if category_ids:
+            self.env['shopping.item'].flush_model(['bought', 'date_bought', 'quantity', 'actual_price', 'category_id', 'user_id'])
+            # حساب الإنفاق في آخر 3 أشهر
+            self.env.cr.execute("""
+                SELECT i.category_id, sum(i.quantity * coalesce(i.actual_price, 0))
+                  FROM shopping_item i
+                 WHERE i.bought
+                   AND i.date_bought >= %s
+                   AND i.category_id IN %s
+                   AND i.user_id = %s
+              GROUP BY i.category_id
+            """, [fields.Date.today() - timedelta(days=HISTORICAL_SPENDING_DAYS), category_ids, self.env.uid])
+            spent = dict(self.env.cr.fetchall())
         for record in self:
-            if record.category_id:
-                # حساب الإنفاق في آخر 3 أشهر
-                three_months_ago = fields.Date.today() - timedelta(days=90)
-                items = self.env['shopping.item'].search([
-                    ('category_id', '=', record.category_id.id),
-                    ('bought', '=', True),
-                    ('date_bought', '>=', three_months_ago),
-                ])
-                record.historical_spending = sum(items.mapped('total_actual'))
-            else:
-                record.historical_spending = 0.0
\ No newline at end of file
+            record.historical_spending = spent.get(record.category_id.id, 0.0)
\ No newline at end of file
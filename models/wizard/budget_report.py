@@ -10,10 +10,11 @@ class BudgetReport(models.TransientModel):
     date_to = fields.Date(string='To Date', required=True, default=fields.Date.today)
     category_id = fields.Many2one('shopping.category', string='Category (optional)')
     group_by_category = fields.Boolean(string='Grouped by category', default=True)
+    run_in_background = fields.Boolean(string='Run in background', default=False)
 
     @api.model
-    def default_get(self, fields):
-        res = super().default_get(fields)
+    def default_get(self, fields_list):
+        res = super().default_get(fields_list)
         # افتراضيًا، تقرير عن الشهر الحالي
         today = fields.Date.today()
         first_day = today.replace(day=1)
@@ -22,35 +23,83 @@ class BudgetReport(models.TransientModel):
         res['date_to'] = last_day
         return res
 
-    def action_generate_report(self):
-        self.ensure_one()
+    def _get_report_filters(self):
+        """الخيارات التي تحدد نتيجة التقرير، وتُستخدم كمفتاح في ذاكرة التقارير"""
+        return {
+            'date_from': self.date_from,
+            'date_to': self.date_to,
+            'category_id': self.category_id.id,
+            'group_by_category': self.group_by_category,
+            'as_of': fields.Date.today(),
+        }
+
+    def _collect_data(self):
+        """بيانات التقرير من ذاكرة التقارير إذا لم تتغير البيانات"""
+        return self.env['shopping.report.cache']._get_or_compute(
+            'budget', self._get_report_filters(), self._compute_data)
+
+    def _compute_data(self):
+        """تجميع المشتريات في قاعدة البيانات"""
+        result = self.env['shopping.analytics.engine'].aggregate(
+            self.date_from, self.date_to,
+            groupings=['category'] if self.group_by_category else [],
+            category_id=self.category_id.id,
+            include_pending=False,
+        )
+        report_data = {
+            'date_from': self.date_from,
+            'date_to': self.date_to,
+            'total_spent': result['totals']['total_spent'],
+            'total_items': result['totals']['count'],
+        }
+        if self.group_by_category:
+            report_data['categories'] = {
+                row['label']: {'count': row['count'], 'amount': row['total_spent']}
+                for row in result['groups']['category']
+            }
+        report_data['burndown'] = self._get_report_budgets()._get_burndown()
+        return report_data
+
+    def _get_report_budgets(self):
+        """الميزانيات التي تتقاطع فترتها مع فترة التقرير"""
         domain = [
-            ('bought', '=', True),
-            ('date_bought', '>=', self.date_from),
-            ('date_bought', '<=', self.date_to),
+            ('start_date', '<=', self.date_to),
+            ('end_date', '>=', self.date_from),
         ]
-
         if self.category_id:
             domain.append(('category_id', '=', self.category_id.id))
+        return self.env['shopping.budget'].search(domain, order='start_date, id')
 
-        items = self.env['shopping.item'].search(domain)
+    def _get_report_csv(self, data):
+        """صفوف CSV للتقرير"""
+        rows = [['Category', 'Items', 'Amount']]
+        rows.extend([category, values['count'], values['amount']]
+                    for category, values in data.get('categories', {}).items())
+        rows.append(['Total', data['total_items'], data['total_spent']])
+        rows.append([])
+        rows.append(['Budget', 'Amount', 'Spent to date', 'Planned to date', 'Variance', 'Projected overrun'])
+        rows.extend([burndown['name'], burndown['amount'], burndown['spent_to_date'], burndown['planned_to_date'],
+                     burndown['variance'], burndown['projected_overrun_date'] or '']
+                    for burndown in data.get('burndown', []))
+        return rows
 
-        report_data = {
-            'date_from': self.date_from,
-            'date_to': self.date_to,
-            'total_spent': sum(items.mapped('total_actual')),
-            'total_items': len(items),
+    def _action_report_job(self):
+        """إنشاء مهمة تقرير في الخلفية بدل الحساب داخل الطلب"""
+        job = self.env['shopping.report.job']._create_for_wizard(
+            self, 'Budget report {} - {}'.format(self.date_from, self.date_to))
+        return {
+            'type': 'ir.actions.act_window',
+            'res_model': 'shopping.report.job',
+            'res_id': job.id,
+            'view_mode': 'form',
+            'target': 'current',
         }
 
-        if self.group_by_category:
-            categories = {}
-            for item in items:
-                category_name = item.category_id.name if item.category_id else 'Unrated'
-                if category_name not in categories:
-                    categories[category_name] = {'count': 0, 'amount': 0.0}
-                categories[category_name]['count'] += 1
-                categories[category_name]['amount'] += item.total_actual
-            report_data['categories'] = categories
+    def action_generate_report(self):
+        self.ensure_one()
+        if self.run_in_background:
+            return self._action_report_job()
+        report_data = self._collect_data()
 
         message = """
         Budget report from {} To {}
@@ -65,13 +114,22 @@ class BudgetReport(models.TransientModel):
             for category, data in report_data['categories'].items():
                 message += "- {}: {:.2f} ({} component)\n".format(category, data['amount'], data['count'])
 
+        if report_data['burndown']:
+            message += "\nBudget burn-down:\n"
+            for burndown in report_data['burndown']:
+                message += "- {}: {:.2f} of {:.2f} spent, {:+.2f} vs plan{}\n".format(
+                    burndown['name'], burndown['spent_to_date'], burndown['amount'], burndown['variance'],
+                    ", overrun on {}".format(burndown['projected_overrun_date'])
+                    if burndown['projected_overrun_date'] else '')
+
+        self.message = message
         return {
             'type': 'ir.actions.act_window',
-            'res_model': 'budget.report.wizard',
+            'res_model': self._name,
             'view_mode': 'form',
+            'views': [(self.env.ref('Shopping_List.view_budget_report_result_form').id, 'form')],
             'target': 'new',
             'res_id': self.id,
-            'context': {'default_message': message},
         }
 
-    message = fields.Text(string='Report result', readonly=True)
\ No newline at end of file
+    message = fields.Text(string='Report result', readonly=True)
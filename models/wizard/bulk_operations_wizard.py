@@ -2,6 +2,10 @@ from odoo import models, fields, api
 from odoo.exceptions import UserError
 
 
+# عدد العناصر في كل دفعة تحديث
+BULK_BATCH_SIZE = 1000
+
+
 class BulkOperationsWizard(models.TransientModel):
     _name = 'shopping.bulk.operations.wizard'
     _description = 'Combined Processing (CPP)'
@@ -48,27 +52,27 @@ class BulkOperationsWizard(models.TransientModel):
         """تنفيذ العملية المجمعة"""
         self.ensure_one()
 
-        # الحصول على العناصر المستهدفة
-        items = self._get_target_items()
+        # نطاق العناصر المستهدفة دون تحميلها
+        domain = self._get_target_domain()
 
-        if not items:
+        if not self.env['shopping.item'].search_count(domain, limit=1):
             raise UserError("No items match the search criteria")
 
         # تنفيذ العملية
         if self.operation_type == 'update_status':
-            updated = self._update_bought_status(items)
+            updated = self._update_bought_status(domain)
             message = "Status of {} items has been updated".format(updated)
         elif self.operation_type == 'update_category':
-            updated = self._update_category(items)
+            updated = self._update_category(domain)
             message = "Category of {} items has been updated".format(updated)
         elif self.operation_type == 'update_priority':
-            updated = self._update_priority(items)
+            updated = self._update_priority(domain)
             message = "Priority of {} items has been updated".format(updated)
         elif self.operation_type == 'delete':
-            deleted = self._delete_items(items)
+            deleted = self._delete_items(domain)
             message =  "{} items have been deleted".format(deleted)
         else:  # archive
-            archived = self._archive_items(items)
+            archived = self._archive_items(domain)
             message = "{} items have been archived".format(archived)
 
         return {
@@ -82,55 +86,68 @@ class BulkOperationsWizard(models.TransientModel):
             }
         }
 
-    def _get_target_items(self):
-        """الحصول على العناصر المستهدفة"""
-        domain = []
-
+    def _get_target_domain(self):
+        """نطاق البحث عن العناصر المستهدفة"""
         if self.apply_to == 'selected':
             # العناصر المحددة في السياق
             if self._context.get('active_model') == 'shopping.item' and self._context.get('active_ids'):
-                domain.append(('id', 'in', self._context['active_ids']))
-            else:
-                return self.env['shopping.item']
+                return [('id', 'in', self._context['active_ids'])]
+            return [('id', 'in', [])]
         elif self.apply_to == 'list':
             if self.target_list_id:
-                domain.append(('list_id', '=', self.target_list_id.id))
-            else:
-                raise UserError("يرجى تحديد قائمة مستهدفة")
+                return [('list_id', '=', self.target_list_id.id)]
+            raise UserError("يرجى تحديد قائمة مستهدفة")
         # else: 'all' - لا توجد قيود إضافية
+        return []
+
+    def _iter_batches(self, domain):
+        """المرور على العناصر المطابقة في دفعات محدودة الحجم بترتيب المعرف"""
+        Item = self.env['shopping.item']
+        last_id = 0
+        while True:
+            batch = Item.search(domain + [('id', '>', last_id)], limit=BULK_BATCH_SIZE, order='id')
+            if not batch:
+                return
+            last_id = batch.ids[-1]
+            yield batch
+            # كتابة التغييرات وتحرير ذاكرة التخزين المؤقت بين الدفعات
+            self.env.flush_all()
+            self.env.invalidate_all()
+
+    def _write_in_batches(self, domain, vals):
+        """تطبيق الكتابة على دفعات عبر ORM ليتم تحديث الحقول المحسوبة والمجمعة"""
+        count = self.env['shopping.item'].search_count(domain)
+        for batch in self._iter_batches(domain):
+            batch.write(vals)
+        return count
 
-        return self.env['shopping.item'].search(domain)
-
-    def _update_bought_status(self, items):
+    def _update_bought_status(self, domain):
         """تحديث حالة الشراء"""
-        items_to_update = items.filtered(lambda x: x.bought != self.new_bought_status)
-        items_to_update.write({
+        return self._write_in_batches(domain + [('bought', '=', not self.new_bought_status)], {
             'bought': self.new_bought_status,
             'date_bought': fields.Datetime.now() if self.new_bought_status else False
         })
-        return len(items_to_update)
 
-    def _update_category(self, items):
+    def _update_category(self, domain):
         """تحديث الفئة"""
-        items_to_update = items.filtered(lambda x: x.category_id != self.new_category_id)
-        items_to_update.write({'category_id': self.new_category_id.id})
-        return len(items_to_update)
+        return self._write_in_batches(domain + [('category_id', '!=', self.new_category_id.id)], {
+            'category_id': self.new_category_id.id,
+        })
 
-    def _update_priority(self, items):
+    def _update_priority(self, domain):
         """تحديث الأولوية"""
-        items_to_update = items.filtered(lambda x: x.priority != self.new_priority)
-        items_to_update.write({'priority': self.new_priority})
-        return len(items_to_update)
+        return self._write_in_batches(domain + [('priority', '!=', self.new_priority)], {
+            'priority': self.new_priority,
+        })
 
-    def _delete_items(self, items):
+    def _delete_items(self, domain):
         """حذف العناصر"""
-        count = len(items)
-        items.unlink()
+        count = self.env['shopping.item'].search_count(domain)
+        for batch in self._iter_batches(domain):
+            batch.unlink()
         return count
 
-    def _archive_items(self, items):
+    def _archive_items(self, domain):
         """أرشفة العناصر (تحديث حالة القائمة)"""
         # في هذا المثال، نقوم بتحديث حالة العنصر إلى "مكتمل"
-        items_to_update = items.filtered(lambda x: not x.bought)
-        items_to_update.write({'bought': True})
-        return len(items_to_update)
\ No newline at end of file
+        return self._write_in_batches(domain + [('bought', '=', False)], {'bought': True})
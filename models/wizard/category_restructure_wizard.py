@@ -0,0 +1,72 @@
+from odoo import models, fields, api
+from odoo.exceptions import UserError
+import base64
+import csv
+import io
+
+
+class CategoryRestructureWizard(models.TransientModel):
+    _name = 'shopping.category.restructure.wizard'
+    _description = 'Restructure shopping categories'
+
+    operation = fields.Selection([
+        ('import', 'Import hierarchy'),
+        ('move', 'Move categories'),
+        ('merge', 'Merge categories'),
+    ], string='Operation', required=True, default='move')
+    import_file = fields.Binary(string='File')
+    import_filename = fields.Char(string='File Name')
+    category_ids = fields.Many2many('shopping.category', string='Categories')
+    target_category_id = fields.Many2one('shopping.category', string='Target category')
+
+    @api.model
+    def default_get(self, fields_list):
+        res = super().default_get(fields_list)
+        if self.env.context.get('active_model') == 'shopping.category' and 'category_ids' in fields_list:
+            res['category_ids'] = [(6, 0, self.env.context.get('active_ids', []))]
+        return res
+
+    def action_execute(self):
+        """تنفيذ العملية المحددة على شجرة الفئات"""
+        self.ensure_one()
+        Category = self.env['shopping.category']
+        if self.operation == 'import':
+            if not self.import_file:
+                raise UserError("Please select a file to import.")
+            count = len(Category._import_hierarchy(self._read_import_paths()))
+            message = "{} category paths have been imported".format(count)
+        elif not self.category_ids:
+            raise UserError("Please select the categories.")
+        elif self.operation == 'move':
+            self.category_ids._move_to(self.target_category_id)
+            message = "{} categories have been moved".format(len(self.category_ids))
+        else:
+            if not self.target_category_id:
+                raise UserError("Please select the target category.")
+            count = len(self.category_ids - self.target_category_id)
+            self.category_ids._merge_into(self.target_category_id)
+            message = "{} categories have been merged into {}".format(count, self.target_category_id.complete_name)
+
+        return {
+            'type': 'ir.actions.client',
+            'tag': 'display_notification',
+            'params': {
+                'title': 'Categories updated',
+                'message': message,
+                'type': 'success',
+                'next': {'type': 'ir.actions.act_window_close'},
+            }
+        }
+
+    def _read_import_paths(self):
+        """قراءة مسارات الفئات من الملف: عمود Category أو العمود الأول، مسار واحد في كل سطر"""
+        try:
+            content = base64.b64decode(self.import_file).decode('utf-8-sig')
+            rows = list(csv.reader(io.StringIO(content)))
+        except (UnicodeDecodeError, csv.Error) as e:
+            raise UserError("Import error: {}".format(str(e)))
+        column = 0
+        if rows and 'Category' in rows[0]:
+            column = rows[0].index('Category')
+            rows = rows[1:]
+        return [row[column].strip() for row in rows if len(row) > column and row[column].strip()]
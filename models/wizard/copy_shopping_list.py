@@ -9,6 +9,7 @@ class CopyShoppingList(models.TransientModel):
     new_list_name = fields.Char(string='Name of the new list', required=True)
     copy_items = fields.Boolean(string='Copy items', default=True)
     reset_bought_status = fields.Boolean(string='Reset Purchase Status', default=True)
+    target_user_ids = fields.Many2many('res.users', string='Copy for users')
 
     @api.model
     def default_get(self, fields):
@@ -21,17 +22,25 @@ class CopyShoppingList(models.TransientModel):
 
     def action_copy_list(self):
         self.ensure_one()
+        if self.target_user_ids:
+            # نسخة لكل مستخدم محدد في استدعاء واحد
+            new_lists = self.original_list_id._clone_for_users(
+                self.target_user_ids, self.new_list_name, self.copy_items, self.reset_bought_status)
+            return {
+                'type': 'ir.actions.act_window',
+                'res_model': 'shopping.list',
+                'view_mode': 'tree,form',
+                'domain': [('id', 'in', new_lists.ids)],
+                'target': 'current',
+            }
+
         new_list = self.original_list_id.copy(default={
             'name': self.new_list_name,
             'state': 'draft',
         })
 
         if self.copy_items:
-            for item in self.original_list_id.item_ids:
-                item.copy(default={
-                    'list_id': new_list.id,
-                    'bought': False if self.reset_bought_status else item.bought,
-                })
+            self.original_list_id._clone_items_to(new_list, self.reset_bought_status)
 
         # فتح القائمة الجديدة
         return {
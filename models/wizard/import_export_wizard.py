@@ -1,8 +1,27 @@
 from odoo import models, fields, api
 from odoo.exceptions import UserError
-import base64
 import csv
 import io
+import itertools
+import re
+import zipfile
+from urllib.parse import urlencode
+
+
+# عدد الصفوف في كل دفعة إنشاء
+IMPORT_BATCH_SIZE = 1000
+# الحد الأقصى لأخطاء الصفوف المعروضة في رسالة النتيجة
+IMPORT_MAX_REPORTED_ERRORS = 20
+# قيم عمود Bought التي تعني أن العنصر مشترى
+IMPORT_TRUE_VALUES = {'1', 'true', 'yes', 'y'}
+
+# عدد العناصر المقروءة في كل جزء أثناء التصدير
+EXPORT_CHUNK_SIZE = 2000
+# نفس أعمدة الاستيراد حتى يعود الملف المصدَّر كما هو، بما في ذلك حالة الشراء وتاريخه
+EXPORT_FIELDNAMES = ['Name', 'Quantity', 'Unit', 'Category', 'Priority', 'Estimated_Price', 'Actual_Price',
+                     'Bought', 'Date_Bought', 'Store', 'Notes']
+EXPORT_READ_FIELDS = ['name', 'quantity', 'uom', 'category_id', 'priority', 'estimated_price', 'actual_price',
+                      'bought', 'date_bought', 'store', 'notes']
 
 
 class ImportExportWizard(models.TransientModel):
@@ -19,11 +38,17 @@ class ImportExportWizard(models.TransientModel):
     import_filename = fields.Char(string='File Name')
     list_id = fields.Many2one('shopping.list', string='Destination List', required=False)
     import_override = fields.Boolean(string='Replace existing data', default=False)
+    import_in_background = fields.Boolean(string='Run in background', default=False)
 
     # حقول التصدير
     export_list_id = fields.Many2one('shopping.list', string='export list', required=False)
     export_all_lists = fields.Boolean(string='Export all lists', default=False)
     export_include_bought = fields.Boolean(string='Include purchased items', default=True)
+    export_compression = fields.Selection([
+        ('none', 'None'),
+        ('gzip', 'Gzip'),
+    ], string='Compression', default='none')
+    export_split_by_list = fields.Boolean(string='One file per list (zip)', default=False)
 
     @api.onchange('operation_type')
     def _onchange_operation_type(self):
@@ -51,144 +76,382 @@ class ImportExportWizard(models.TransientModel):
         if not self.list_id:
             raise UserError("Please select a destination menu.")
 
+        if self.import_in_background:
+            return self._action_import_job()
+
         try:
-            # فك تشفير الملف
-            file_content = base64.b64decode(self.import_file).decode('utf-8')
-            csv_file = io.StringIO(file_content)
-            csv_reader = csv.DictReader(csv_file)
-
-            imported_count = 0
-            for row in csv_reader:
-                # تحويل البيانات
-                item_vals = {
-                    'name': row.get('Name', '').strip(),
-                    'quantity': float(row.get('Quantity', 1)),
-                    'uom': row.get('Unit', 'unit'),
-                    'priority': row.get('Priority', 'medium'),
-                    'estimated_price': float(row.get('Estimated_Price', 0)),
-                    'list_id': self.list_id.id,
-                    'notes': row.get('Notes', ''),
-                }
-
-                # معالجة الفئة
-                category_name = row.get('Category', '').strip()
-                if category_name:
-                    category = self.env['shopping.category'].search([('name', '=', category_name)], limit=1)
-                    if not category:
-                        category = self.env['shopping.category'].create({'name': category_name})
-                    item_vals['category_id'] = category.id
-
-                # التحقق من العنصر الموجود
-                if self.import_override:
-                    existing_item = self.env['shopping.item'].search([
-                        ('name', '=', item_vals['name']),
-                        ('list_id', '=', self.list_id.id)
-                    ], limit=1)
-                    if existing_item:
-                        existing_item.write(item_vals)
-                    else:
-                        self.env['shopping.item'].create(item_vals)
-                else:
-                    self.env['shopping.item'].create(item_vals)
-
-                imported_count += 1
-
-            message = "{} items have been successfully imported to {}".format(imported_count, self.list_id.name)
-            return {
-                'type': 'ir.actions.client',
-                'tag': 'display_notification',
-                'params': {
-                    'title': 'Import success',
-                    'message': message,
-                    'type': 'success',
-                    'sticky': False,
-                }
+            attachment = self._get_import_attachment()
+            with self._open_attachment_stream(attachment) as stream:
+                result = self._import_stream(stream, self.list_id, self.import_override)
+        except (UnicodeDecodeError, csv.Error) as e:
+            raise UserError("Import error: {}".format(str(e)))
+
+        message = "{} items have been successfully imported to {}".format(result['imported'], self.list_id.name)
+        if result['errors']:
+            message += "\n{} rows were skipped:\n".format(len(result['errors']))
+            message += "\n".join(
+                "Row {}: {}".format(row_number, error)
+                for row_number, error in result['errors'][:IMPORT_MAX_REPORTED_ERRORS]
+            )
+        return {
+            'type': 'ir.actions.client',
+            'tag': 'display_notification',
+            'params': {
+                'title': 'Import success' if not result['errors'] else 'Import finished with errors',
+                'message': message,
+                'type': 'success' if not result['errors'] else 'warning',
+                'sticky': bool(result['errors']),
             }
+        }
 
-        except Exception as e:
-            raise UserError("Import error: {}".format(str(e)))
+    def _action_import_job(self):
+        """إنشاء مهمة استيراد في الخلفية بدل المعالجة داخل الطلب"""
+        job = self.env['shopping.import.job'].create({
+            'name': self.import_filename or 'Import {}'.format(self.list_id.name),
+            'list_id': self.list_id.id,
+            'import_override': self.import_override,
+            'attachment_id': self._get_import_attachment().id,
+        })
+        # نقل المرفق إلى المهمة حتى لا يُحذف مع تنظيف المعالج المؤقت
+        job.attachment_id.sudo().write({
+            'res_model': job._name,
+            'res_field': False,
+            'res_id': job.id,
+            'name': job.name,
+        })
+        job._trigger_processing()
+        return {
+            'type': 'ir.actions.act_window',
+            'res_model': 'shopping.import.job',
+            'res_id': job.id,
+            'view_mode': 'form',
+            'target': 'current',
+        }
 
-    def _action_export(self):
-        """تصدير البيانات إلى ملف CSV"""
-        # بناء نطاق البحث
-        domain = []
-        if not self.export_all_lists and self.export_list_id:
-            domain.append(('list_id', '=', self.export_list_id.id))
+    def _get_import_attachment(self):
+        """المرفق الذي يخزن ملف الاستيراد"""
+        self.ensure_one()
+        return self.env['ir.attachment'].sudo().search([
+            ('res_model', '=', self._name),
+            ('res_field', '=', 'import_file'),
+            ('res_id', '=', self.id),
+        ], limit=1)
 
-        if not self.export_include_bought:
-            domain.append(('bought', '=', False))
+    @api.model
+    def _open_attachment_stream(self, attachment):
+        """فتح المرفق كتدفق ثنائي دون تحميله بالكامل في الذاكرة"""
+        if attachment.store_fname:
+            return open(attachment._full_path(attachment.store_fname), 'rb')
+        return io.BytesIO(attachment.raw or b'')
 
-        items = self.env['shopping.item'].search(domain)
+    @api.model
+    def _import_stream(self, stream, target_list, override=False, skip_rows=0, batch_callback=None):
+        """استيراد العناصر من تدفق CSV على دفعات
 
-        # إنشاء محتوى CSV
-        output = io.StringIO()
-        fieldnames = ['Name', 'Quantity', 'Unit', 'Category', 'Priority', 'Estimated_Price', 'Bought', 'Store', 'Notes']
-        writer = csv.DictWriter(output, fieldnames=fieldnames)
-        writer.writeheader()
+        يتم تحليل الملف تدريجيًا، وتجميع الصفوف في دفعات تُنشأ بعملية create واحدة.
+        الصفوف غير الصالحة يتم تخطيها وتسجيلها برقم السطر بدل إلغاء الاستيراد بالكامل.
+        batch_callback(result) يُستدعى بعد كل دفعة، ويمكن استخدامه لحفظ نقطة التقدم.
+        """
+        reader = csv.DictReader(io.TextIOWrapper(stream, encoding='utf-8-sig', newline=''))
+        context = {
+            'list': target_list,
+            'override': override,
+            'categories': self._load_category_map(),
+            'existing': self._load_item_index(target_list) if override else {},
+            'uoms': set(self.env['shopping.item']._fields['uom'].get_values(self.env)),
+            'priorities': set(self.env['shopping.item']._fields['priority'].get_values(self.env)),
+        }
+        result = {'rows': skip_rows, 'imported': 0, 'errors': []}
+
+        batch = []
+        for row in itertools.islice(reader, skip_rows, None):
+            result['rows'] += 1
+            try:
+                batch.append((reader.line_num, self._parse_import_row(row, context)))
+            except ValueError as e:
+                result['errors'].append((reader.line_num, str(e)))
+            if len(batch) >= IMPORT_BATCH_SIZE:
+                self._import_batch(batch, context, result)
+                batch = []
+                if batch_callback:
+                    batch_callback(result)
+        if batch:
+            self._import_batch(batch, context, result)
+        if batch_callback:
+            batch_callback(result)
+        return result
+
+    @api.model
+    def _load_category_map(self):
+        """تحميل الفئات مسبقًا في قاموس اسم أو مسار كامل -> معرف"""
+        categories = self.env['shopping.category'].search_read([], ['name', 'complete_name'])
+        category_map = {category['complete_name']: category['id'] for category in categories}
+        category_map.update((category['name'], category['id']) for category in categories)
+        return category_map
+
+    @api.model
+    def _load_item_index(self, target_list):
+        """فهرس (القائمة، الاسم) -> معرف العنصر لوضع الاستبدال"""
+        index = {}
+        for item in self.env['shopping.item'].search_read([('list_id', '=', target_list.id)], ['name']):
+            index.setdefault(item['name'], item['id'])
+        return index
+
+    @api.model
+    def _parse_import_row(self, row, context):
+        """تحويل صف CSV إلى قيم عنصر"""
+        name = (row.get('Name') or '').strip()
+        if not name:
+            raise ValueError("Missing item name")
+        uom = (row.get('Unit') or '').strip() or 'unit'
+        if uom not in context['uoms']:
+            raise ValueError("Unknown unit '{}'".format(uom))
+        priority = (row.get('Priority') or '').strip() or 'medium'
+        if priority not in context['priorities']:
+            raise ValueError("Unknown priority '{}'".format(priority))
+        try:
+            quantity = float(row.get('Quantity') or 1)
+            estimated_price = float(row.get('Estimated_Price') or 0)
+            actual_price = float(row['Actual_Price']) if row.get('Actual_Price') else None
+        except ValueError as e:
+            raise ValueError("Invalid number: {}".format(e))
+        try:
+            date_bought = fields.Datetime.to_datetime((row.get('Date_Bought') or '').strip() or None)
+        except ValueError as e:
+            raise ValueError("Invalid purchase date: {}".format(e))
+
+        vals = {
+            'name': name,
+            'quantity': quantity,
+            'uom': uom,
+            'priority': priority,
+            'estimated_price': estimated_price,
+            'list_id': context['list'].id,
+            'notes': row.get('Notes', ''),
+            'category_name': (row.get('Category') or '').strip(),
+        }
+        if actual_price is not None:
+            vals['actual_price'] = actual_price
+        # عمود Bought وحده لا يكفي: التصدير يكتبه دائمًا، واعتماده بتاريخ الاستيراد
+        # يسجل المشتريات القديمة على الميزانيات الحالية. لذلك يلزم تاريخ شراء صريح
+        if date_bought and (row.get('Bought') or '').strip().lower() in IMPORT_TRUE_VALUES:
+            vals['bought'] = True
+            vals['date_bought'] = date_bought
+        return vals
+
+    @api.model
+    def _import_batch(self, batch, context, result):
+        """إنشاء وتحديث دفعة من العناصر"""
+        categories = context['categories']
+        missing = sorted({vals['category_name'] for _, vals in batch
+                          if vals['category_name'] and vals['category_name'] not in categories})
+        if missing:
+            # إنشاء كل الفئات الجديدة في الدفعة مع مساراتها مثل 'A / B' بعملية واحدة لكل مستوى،
+            # دون نقل الفئات الموجودة: إعادة ترتيب الشجرة تتم من معالج إعادة الهيكلة فقط
+            categories.update(self.env['shopping.category']._import_hierarchy(missing, move_existing=False))
+
+        to_create = []
+        to_update = {}
+        pending = {}
+        existing = context['existing']
+        for row_number, vals in batch:
+            category_name = vals.pop('category_name')
+            if category_name:
+                if category_name not in categories:
+                    result['errors'].append((row_number, "Category path '{}' conflicts with the existing "
+                                                         "category tree".format(category_name)))
+                    continue
+                vals['category_id'] = categories[category_name]
+            if not context['override']:
+                to_create.append((row_number, vals))
+                continue
+            if vals['name'] in existing:
+                to_update[existing[vals['name']]] = (row_number, vals)
+            elif vals['name'] in pending:
+                # نفس الاسم مكرر في الدفعة: آخر صف هو الذي يُعتمد
+                to_create[pending[vals['name']]] = (row_number, vals)
+                result['imported'] += 1
+            else:
+                pending[vals['name']] = len(to_create)
+                to_create.append((row_number, vals))
+
+        Item = self.env['shopping.item']
+        for item_id, (row_number, vals) in to_update.items():
+            try:
+                with self.env.cr.savepoint():
+                    Item.browse(item_id).write(vals)
+                result['imported'] += 1
+            except Exception as e:
+                result['errors'].append((row_number, str(e)))
+
+        items = self._create_import_items(to_create, result)
+        if context['override']:
+            for item in items:
+                existing.setdefault(item.name, item.id)
+
+        # تحرير ذاكرة التخزين المؤقت بين الدفعات
+        self.env.flush_all()
+        self.env.invalidate_all()
 
-        for item in items:
-            writer.writerow({
-                'Name': item.name,
-                'Quantity': item.quantity,
-                'Unit': item.uom,
-                'Category': item.category_id.name if item.category_id else '',
-                'Priority': item.priority,
-                'Estimated_Price': item.estimated_price,
-                'Bought': 'Yes' if item.bought else 'No',
-                'Store': item.store or '',
-                'Notes': item.notes or '',
-            })
-
-        csv_content = output.getvalue()
-        output.close()
-
-        # إرجاع action للتحميل
-        filename ="shopping_export_{}.csv".format(fields.Datetime.now().strftime('%Y%m%d_%H%M%S'))
+    @api.model
+    def _create_import_items(self, to_create, result):
+        """إنشاء العناصر دفعة واحدة، مع الرجوع إلى الإنشاء صفًا بصف عند الفشل"""
+        Item = self.env['shopping.item']
+        if not to_create:
+            return Item
+        try:
+            with self.env.cr.savepoint():
+                items = Item.create([vals for _, vals in to_create])
+            result['imported'] += len(items)
+            return items
+        except Exception:
+            items = Item
+            for row_number, vals in to_create:
+                try:
+                    with self.env.cr.savepoint():
+                        items |= Item.create(vals)
+                    result['imported'] += 1
+                except Exception as e:
+                    result['errors'].append((row_number, str(e)))
+            return items
+
+    def _action_export(self):
+        """تصدير البيانات إلى ملف CSV عبر مسار التحميل المتدفق"""
+        params = {
+            'include_bought': int(self.export_include_bought),
+            'compression': self.export_compression,
+            'split_by_list': int(self.export_split_by_list),
+        }
+        if not self.export_all_lists and self.export_list_id:
+            params['list_id'] = self.export_list_id.id
         return {
             'type': 'ir.actions.act_url',
-            'url':'/web/content/?model=shopping.import.export.wizard&id={}&field=export_file&filename={}&download=true'.format(self.id, filename),
+            'url': '/shopping/export?{}'.format(urlencode(params)),
             'target': 'self',
         }
 
-    export_file = fields.Binary(string='export file', compute='_compute_export_file')
+    @api.model
+    def _get_export_domain(self, list_id=None, include_bought=True):
+        """بناء نطاق البحث للتصدير"""
+        domain = []
+        if list_id:
+            domain.append(('list_id', '=', list_id))
+        if not include_bought:
+            domain.append(('bought', '=', False))
+        return domain
 
-    def _compute_export_file(self):
-        """حساب ملف التصدير"""
-        for record in self:
-            if record.operation_type == 'export':
-                # إعادة تنفيذ التصدير عند الطلب
-                record.export_file = base64.b64encode(self._generate_export_content().encode('utf-8'))
-            else:
-                record.export_file = False
+    @api.model
+    def _iter_export_chunks(self, domain):
+        """قراءة العناصر على أجزاء ثابتة الحجم بترتيب المعرف"""
+        Item = self.env['shopping.item']
+        last_id = 0
+        while True:
+            items = Item.search_read(domain + [('id', '>', last_id)], EXPORT_READ_FIELDS,
+                                     limit=EXPORT_CHUNK_SIZE, order='id')
+            if not items:
+                return
+            yield items
+            last_id = items[-1]['id']
+            Item.invalidate_model()
 
-    def _generate_export_content(self):
-        """توليد محتوى التصدير"""
+    @api.model
+    def _iter_export_csv(self, domain):
+        """توليد محتوى CSV كأجزاء من البايتات دون بناء الملف كاملًا"""
         output = io.StringIO()
-        fieldnames = ['Name', 'Quantity', 'Unit', 'Category', 'Priority', 'Estimated_Price', 'Bought', 'Store', 'Notes']
-        writer = csv.DictWriter(output, fieldnames=fieldnames)
+        writer = csv.DictWriter(output, fieldnames=EXPORT_FIELDNAMES)
         writer.writeheader()
+        category_names = {}
+        for items in self._iter_export_chunks(domain):
+            self._load_category_names(items, category_names)
+            for item in items:
+                category_id = item['category_id'] and item['category_id'][0]
+                writer.writerow({
+                    'Name': item['name'],
+                    'Quantity': item['quantity'],
+                    'Unit': item['uom'],
+                    'Category': category_names.get(category_id, ''),
+                    'Priority': item['priority'],
+                    'Estimated_Price': item['estimated_price'],
+                    'Actual_Price': item['actual_price'],
+                    'Bought': 'Yes' if item['bought'] else 'No',
+                    'Date_Bought': fields.Datetime.to_string(item['date_bought']) or '',
+                    'Store': item['store'] or '',
+                    'Notes': item['notes'] or '',
+                })
+            yield output.getvalue().encode('utf-8')
+            output.seek(0)
+            output.truncate()
+        if output.tell():
+            # الملف لا يحتوي إلا على العناوين
+            yield output.getvalue().encode('utf-8')
 
-        domain = []
-        if not self.export_all_lists and self.export_list_id:
-            domain.append(('list_id', '=', self.export_list_id.id))
-        if not self.export_include_bought:
-            domain.append(('bought', '=', False))
+    @api.model
+    def _load_category_names(self, items, category_names):
+        """تحميل أسماء الفئات الجديدة في الجزء الحالي فقط"""
+        missing = {item['category_id'][0] for item in items
+                   if item['category_id'] and item['category_id'][0] not in category_names}
+        if missing:
+            for category in self.env['shopping.category'].browse(missing).read(['name']):
+                category_names[category['id']] = category['name']
+
+    @api.model
+    def _iter_export_zip(self, domain):
+        """توليد أرشيف zip متدفق يحتوي على ملف لكل قائمة"""
+        buffer = _ZipStreamBuffer()
+        with zipfile.ZipFile(buffer, 'w', compression=zipfile.ZIP_DEFLATED) as archive:
+            for filename, list_domain in self._iter_export_files(domain):
+                with archive.open(filename, 'w', force_zip64=True) as member:
+                    for chunk in self._iter_export_csv(list_domain):
+                        member.write(chunk)
+                        yield buffer.pop()
+                yield buffer.pop()
+        yield buffer.pop()
+
+    @api.model
+    def _iter_export_files(self, domain):
+        """أسماء الملفات ونطاقاتها لكل قائمة تحتوي على عناصر مطابقة"""
+        List = self.env['shopping.list']
+        for list_ids in self._iter_export_list_chunks(domain):
+            for lst in List.browse(list_ids).read(['name']):
+                yield ('{}_{}.csv'.format(re.sub(r'[^\w\-]+', '_', lst['name']).strip('_'), lst['id']),
+                       domain + [('list_id', '=', lst['id'])])
+            List.invalidate_model()
+        if self.env['shopping.item'].search_count(domain + [('list_id', '=', False)], limit=1):
+            yield 'without_list.csv', domain + [('list_id', '=', False)]
+
+    @api.model
+    def _iter_export_list_chunks(self, domain):
+        """معرفات القوائم التي تحتوي على عناصر مطابقة للنطاق على أجزاء، بالتصفح بالمفتاح على list_id"""
+        Item = self.env['shopping.item']
+        last_id = 0
+        while True:
+            query = Item._where_calc(domain + [('list_id', '>', last_id)])
+            Item._apply_ir_rules(query, 'read')
+            query.order = '"shopping_item"."list_id"'
+            query.limit = EXPORT_CHUNK_SIZE
+            query_str, params = query.select('DISTINCT "shopping_item"."list_id"')
+            self.env.cr.execute(query_str, params)
+            list_ids = [row[0] for row in self.env.cr.fetchall()]
+            if not list_ids:
+                return
+            yield list_ids
+            last_id = list_ids[-1]
+
+
+class _ZipStreamBuffer:
+    """مخزن كتابة مؤقت غير قابل للتنقل يسمح لـ zipfile بالكتابة على دفعات"""
+
+    def __init__(self):
+        self._chunks = []
+
+    def write(self, data):
+        self._chunks.append(bytes(data))
+        return len(data)
+
+    def flush(self):
+        pass
 
-        items = self.env['shopping.item'].search(domain)
-
-        for item in items:
-            writer.writerow({
-                'Name': item.name,
-                'Quantity': item.quantity,
-                'Unit': item.uom,
-                'Category': item.category_id.name if item.category_id else '',
-                'Priority': item.priority,
-                'Estimated_Price': item.estimated_price,
-                'Bought': 'Yes' if item.bought else 'No',
-                'Store': item.store or '',
-                'Notes': item.notes or '',
-            })
-
-        content = output.getvalue()
-        output.close()
-        return content
\ No newline at end of file
+    def pop(self):
+        data = b''.join(self._chunks)
+        self._chunks = []
+        return data
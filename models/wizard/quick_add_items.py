@@ -9,25 +9,23 @@ class QuickAddItems(models.TransientModel):
     item_lines = fields.One2many('quick.add.items.line', 'wizard_id', string='Items')
 
     def action_add_items(self):
-        for wizard in self:
-            for line in wizard.item_lines:
-                if line.name:
-                    self.env['shopping.item'].create({
-                        'name': line.name,
-                        'quantity': line.quantity,
-                        'uom': line.uom,
-                        'category_id': line.category_id.id,
-                        'priority': line.priority,
-                        'estimated_price': line.estimated_price,
-                        'list_id': wizard.list_id.id,
-                    })
+        # إنشاء كل العناصر بعملية واحدة
+        self.env['shopping.item'].create([{
+            'name': line.name,
+            'quantity': line.quantity,
+            'uom': line.uom,
+            'category_id': line.category_id.id,
+            'priority': line.priority,
+            'estimated_price': line.estimated_price,
+            'list_id': wizard.list_id.id,
+        } for wizard in self for line in wizard.item_lines if line.name])
         return {'type': 'ir.actions.act_window_close'}
 
 class QuickAddItemsLine(models.TransientModel):
     _name = 'quick.add.items.line'
     _description = 'Quick element addition line'
 
-    wizard_id = fields.Many2one('quick.add.items.wizard', string='Wizard')
+    wizard_id = fields.Many2one('shopping.quick.add.items.wizard', string='Wizard')
     name = fields.Char(string='item name', required=True)
     quantity = fields.Float(string='Quantity', default=1.0)
     uom = fields.Selection([
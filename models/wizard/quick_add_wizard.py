@@ -1,5 +1,66 @@
 from odoo import models, fields, api
 from odoo.exceptions import UserError
+import re
+
+
+# أنماط مترجمة مسبقًا لتحليل سطر مثل: "2 kg tomatoes 5.5 @high #Food"
+_QUANTITY_RE = re.compile(r'^(\d+(?:[.,]\d+)?)([a-zA-Z]*)$')
+_PRICE_RE = re.compile(r'^\$?(\d+(?:[.,]\d+)?)\$?$')
+_PRIORITY_RE = re.compile(r'^@(high|medium|low|h|m|l)$', re.IGNORECASE)
+_CATEGORY_RE = re.compile(r'^#(\S+)$')
+
+_UOM_ALIASES = {
+    'unit': 'unit', 'units': 'unit', 'pc': 'unit', 'pcs': 'unit', 'x': 'unit',
+    'kg': 'kg', 'kgs': 'kg', 'kilo': 'kg',
+    'g': 'g', 'gr': 'g', 'gram': 'g', 'grams': 'g',
+    'l': 'l', 'liter': 'l', 'liters': 'l', 'litre': 'l',
+    'ml': 'ml',
+    'pack': 'pack', 'packs': 'pack', 'pk': 'pack',
+    'bottle': 'bottle', 'bottles': 'bottle',
+}
+_PRIORITY_ALIASES = {'h': 'high', 'm': 'medium', 'l': 'low'}
+
+
+def parse_quick_add_line(line):
+    """تحليل سطر نصي إلى الكمية والوحدة والاسم والسعر والأولوية والفئة"""
+    tokens = line.split()
+    result = {}
+
+    # الأولوية والفئة يمكن أن تظهر في أي مكان في السطر
+    name_tokens = []
+    for token in tokens:
+        priority = _PRIORITY_RE.match(token)
+        category = _CATEGORY_RE.match(token)
+        if priority:
+            value = priority.group(1).lower()
+            result['priority'] = _PRIORITY_ALIASES.get(value, value)
+        elif category:
+            result['category_name'] = category.group(1).replace('_', ' ')
+        else:
+            name_tokens.append(token)
+
+    # الكمية في البداية، مع وحدة ملاصقة (2kg) أو في الكلمة التالية (2 kg)
+    if name_tokens:
+        quantity = _QUANTITY_RE.match(name_tokens[0])
+        if quantity and (not quantity.group(2) or quantity.group(2).lower() in _UOM_ALIASES):
+            result['quantity'] = float(quantity.group(1).replace(',', '.'))
+            name_tokens.pop(0)
+            if quantity.group(2):
+                result['uom'] = _UOM_ALIASES[quantity.group(2).lower()]
+            elif name_tokens and name_tokens[0].lower() in _UOM_ALIASES and len(name_tokens) > 1:
+                result['uom'] = _UOM_ALIASES[name_tokens.pop(0).lower()]
+
+    # السعر هو الرقم في نهاية السطر
+    if len(name_tokens) > 1:
+        price = _PRICE_RE.match(name_tokens[-1])
+        if price:
+            result['estimated_price'] = float(price.group(1).replace(',', '.'))
+            name_tokens.pop()
+
+    result['name'] = ' '.join(name_tokens)
+    if not result['name']:
+        raise ValueError("Missing item name")
+    return result
 
 
 class QuickAddWizard(models.TransientModel):
@@ -8,6 +69,9 @@ class QuickAddWizard(models.TransientModel):
 
     list_id = fields.Many2one('shopping.list', string='Shopping List', required=True)
     item_lines = fields.One2many('shopping.quick.add.line', 'wizard_id', string='Items')
+    # إضافة سريعة من نص ملصوق، سطر لكل عنصر
+    raw_text = fields.Text(string='Paste items',
+                           help='One item per line, e.g. "2 kg tomatoes 5.5 @high #Food"')
 
     # الحقول الافتراضية للعناصر الجديدة
     default_category_id = fields.Many2one('shopping.category', string='Default category')
@@ -35,32 +99,18 @@ class QuickAddWizard(models.TransientModel):
         if self._context.get('active_id') and self._context.get('active_model') == 'shopping.list':
             res['list_id'] = self._context['active_id']
 
-        # تعبئة تلقائية بخطوط فارغة للإضافة السريعة
-        if 'item_lines' in fields and 'item_lines' not in res:
-            res['item_lines'] = [(0, 0, {'name': '', 'quantity': 1.0})]
-
         return res
 
     def action_add_items(self):
         """إضافة العناصر إلى قائمة التسوق"""
         self.ensure_one()
-        if not self.item_lines:
+        vals_list = [self._prepare_line_vals(line) for line in self.item_lines]
+        vals_list += self._parse_raw_text()
+        if not vals_list:
            raise UserError("Please add at least one item")
 
-        created_items = []
-        for line in self.item_lines:
-            item_vals = {
-                'name': line.name,
-                'quantity': line.quantity,
-                'uom': line.uom or self.default_uom,
-                'category_id': line.category_id.id or self.default_category_id.id,
-                'priority': line.priority or self.default_priority,
-                'estimated_price': line.estimated_price,
-                'list_id': self.list_id.id,
-                'notes': line.notes,
-            }
-            item = self.env['shopping.item'].create(item_vals)
-            created_items.append(item.id)
+        # إنشاء كل العناصر بعملية واحدة
+        created_items = self.env['shopping.item'].create(vals_list)
 
         # عرض رسالة نجاح
         message = "{} items have been successfully added to the list {}".format(len(created_items), self.list_id.name)
@@ -73,6 +123,54 @@ class QuickAddWizard(models.TransientModel):
             'context': {'create': False},
         }
 
+    def _prepare_line_vals(self, line):
+        """قيم العنصر من سطر الإدخال"""
+        return {
+            'name': line.name,
+            'quantity': line.quantity,
+            'uom': line.uom or self.default_uom,
+            'category_id': line.category_id.id or self.default_category_id.id,
+            'priority': line.priority or self.default_priority,
+            'estimated_price': line.estimated_price,
+            'list_id': self.list_id.id,
+            'notes': line.notes,
+        }
+
+    def _parse_raw_text(self):
+        """تحليل النص الملصوق إلى قيم عناصر باستخدام خريطة فئات محملة مسبقًا"""
+        if not self.raw_text:
+            return []
+        categories = {
+            category['name'].lower(): category['id']
+            for category in self.env['shopping.category'].search_read([], ['name'])
+        }
+        vals_list = []
+        errors = []
+        for line_number, line in enumerate(self.raw_text.splitlines(), start=1):
+            if not line.strip():
+                continue
+            try:
+                parsed = parse_quick_add_line(line)
+            except ValueError as e:
+                errors.append("Line {}: {}".format(line_number, e))
+                continue
+            category_name = parsed.pop('category_name', '')
+            if category_name and category_name.lower() not in categories:
+                errors.append("Line {}: unknown category '{}'".format(line_number, category_name))
+                continue
+            vals_list.append({
+                'name': parsed['name'],
+                'quantity': parsed.get('quantity', 1.0),
+                'uom': parsed.get('uom', self.default_uom),
+                'category_id': categories.get(category_name.lower()) or self.default_category_id.id,
+                'priority': parsed.get('priority', self.default_priority),
+                'estimated_price': parsed.get('estimated_price', 0.0),
+                'list_id': self.list_id.id,
+            })
+        if errors:
+            raise UserError("Some lines could not be read:\n{}".format("\n".join(errors)))
+        return vals_list
+
     def action_add_another(self):
         """إضافة عناصر أخرى مع الحفاظ على الإعدادات"""
         self.ensure_one()
@@ -32,7 +32,16 @@ class ShoppingAnalyticsWizard(models.TransientModel):
     # خيارات التقرير
     group_by_category = fields.Boolean(string='Grouped by category', default=True)
     group_by_month = fields.Boolean(string='Grouped by month', default=False)
+    group_by_week = fields.Boolean(string='Grouped by week', default=False)
+    group_by_user = fields.Boolean(string='Grouped by user', default=False)
+    group_by_store = fields.Boolean(string='Grouped by store', default=False)
     show_trends = fields.Boolean(string='View directions', default=True)
+    trend_interval = fields.Selection([
+        ('day', 'Day'),
+        ('week', 'Week'),
+        ('month', 'Month'),
+    ], string='Trend interval', default='week')
+    run_in_background = fields.Boolean(string='Run in background', default=False)
 
     @api.onchange('date_range')
     def _onchange_date_range(self):
@@ -56,6 +65,8 @@ class ShoppingAnalyticsWizard(models.TransientModel):
     def action_generate_report(self):
         """إنشاء التقرير"""
         self.ensure_one()
+        if self.run_in_background:
+            return self._action_report_job()
 
         # جمع البيانات
         data = self._collect_data()
@@ -63,56 +74,96 @@ class ShoppingAnalyticsWizard(models.TransientModel):
         # إنشاء التقرير
         return self._generate_report_action(data)
 
-    def _collect_data(self):
-        """جمع البيانات للتحليل"""
-        domain = [
-            ('date_bought', '>=', self.start_date),
-            ('date_bought', '<=', self.end_date),
-        ]
-
-        if self.category_id:
-            domain.append(('category_id', '=', self.category_id.id))
+    def _action_report_job(self):
+        """إنشاء مهمة تقرير في الخلفية بدل الحساب داخل الطلب"""
+        job = self.env['shopping.report.job']._create_for_wizard(
+            self, 'Analytics {} {} - {}'.format(self.report_type, self.start_date, self.end_date))
+        return {
+            'type': 'ir.actions.act_window',
+            'res_model': 'shopping.report.job',
+            'res_id': job.id,
+            'view_mode': 'form',
+            'target': 'current',
+        }
 
-        if self.user_id:
-            domain.append(('list_id.user_id', '=', self.user_id.id))
+    def _get_groupings(self):
+        """التجميعات المختارة في المعالج"""
+        return [grouping for grouping, enabled in (
+            ('category', self.group_by_category),
+            ('month', self.group_by_month),
+            ('week', self.group_by_week),
+            ('user', self.group_by_user),
+            ('store', self.group_by_store),
+        ) if enabled]
+
+    def _get_report_filters(self):
+        """الخيارات التي تحدد نتيجة التقرير، وتُستخدم كمفتاح في ذاكرة التقارير"""
+        return {
+            'report_type': self.report_type,
+            'start_date': self.start_date,
+            'end_date': self.end_date,
+            'category_id': self.category_id.id,
+            'user_id': self.user_id.id,
+            'include_bought': self.include_bought,
+            'include_pending': self.include_pending,
+            'groupings': self._get_groupings(),
+            'trends': (self.show_trends or self.report_type == 'comparison') and self.trend_interval,
+        }
 
-        items = self.env['shopping.item'].search(domain)
+    def _collect_data(self):
+        """جمع البيانات للتحليل، من ذاكرة التقارير إذا لم تتغير البيانات"""
+        return self.env['shopping.report.cache']._get_or_compute(
+            'analytics', self._get_report_filters(), self._compute_data)
+
+    def _compute_data(self):
+        """حساب بيانات التحليل بتجميع في قاعدة البيانات"""
+        Engine = self.env['shopping.analytics.engine']
+        filters = {
+            'category_id': self.category_id.id,
+            'user_id': self.user_id.id,
+            'include_bought': self.include_bought,
+            'include_pending': self.include_pending,
+        }
+        result = Engine.aggregate(self.start_date, self.end_date, groupings=self._get_groupings(), **filters)
+        totals = result['totals']
 
         # تحضير البيانات الأساسية
         data = {
-            'total_items': len(items),
-            'bought_items': len(items.filtered(lambda x: x.bought)),
-            'total_spent': sum(items.filtered(lambda x: x.bought).mapped('total_actual')),
-            'total_estimated': sum(items.mapped('total_estimated')),
+            'total_items': totals['count'],
+            'bought_items': totals['bought_count'],
+            'total_spent': totals['total_spent'],
+            'total_estimated': totals['total_estimated'],
             'start_date': self.start_date,
             'end_date': self.end_date,
             'report_type': self.report_type,
+            'groups': result['groups'],
         }
-
-        # تجميع البيانات حسب الفئة
-        if self.group_by_category:
-            category_data = {}
-            for item in items:
-                category_name = item.category_id.name if item.category_id else 'Unrated'
-                if category_name not in category_data:
-                    category_data[category_name] = {
-                        'count': 0,
-                        'bought_count': 0,
-                        'total_spent': 0.0,
-                        'total_estimated': 0.0,
-                    }
-
-                category_data[category_name]['count'] += 1
-                category_data[category_name]['total_estimated'] += item.total_estimated
-
-                if item.bought:
-                    category_data[category_name]['bought_count'] += 1
-                    category_data[category_name]['total_spent'] += item.total_actual
-
-            data['category_data'] = category_data
-
+        if 'category' in result['groups']:
+            data['category_data'] = {row['label']: row for row in result['groups']['category']}
+        if self.show_trends or self.report_type == 'comparison':
+            data['trends'] = Engine.time_series(self.start_date, self.end_date, self.trend_interval, **filters)
         return data
 
+    def _get_report_csv(self, data):
+        """صفوف CSV للتقرير: المجموع ثم المجموعات ثم السلسلة الزمنية"""
+        rows = [
+            ['Group', 'Key', 'Label', 'Items', 'Bought', 'Pending', 'Estimated', 'Spent', 'Completion'],
+            ['total', '', 'Total', data['total_items'], data['bought_items'],
+             data['total_items'] - data['bought_items'], data['total_estimated'], data['total_spent'],
+             (data['bought_items'] / data['total_items'] * 100) if data['total_items'] else 0],
+        ]
+        for grouping, groups in data['groups'].items():
+            rows.extend([grouping, stats['key'], stats['label'], stats['count'], stats['bought_count'],
+                         stats['pending_count'], stats['total_estimated'], stats['total_spent'],
+                         stats['completion_rate']] for stats in groups)
+        if 'trends' in data:
+            current = data['trends']['current']
+            rows.extend(['trend', label, label, items, bought, items - bought, estimated, spent, completion]
+                        for label, items, bought, estimated, spent, completion in zip(
+                            data['trends']['labels'], current['items'], current['bought'],
+                            current['estimated'], current['spent'], current['completion']))
+        return rows
+
     def _generate_report_action(self, data):
         """إنشاء إجراء لعرض التقرير"""
         # في بيئة حقيقية، يمكن إنشاء تقرير PDF أو عرض في واجهة مخصصة
@@ -140,12 +191,22 @@ class ShoppingAnalyticsWizard(models.TransientModel):
 
 
 
-        if 'category_data' in data:
-           message += "\nDetails by category:\n"
+        for grouping, rows in data['groups'].items():
+            message += "\nDetails by {}:\n".format(grouping)
+            for stats in rows:
+                message += "- {}: {}/{} ({:.1f}%) - {:.2f} / {:.2f}\n".format(
+                    stats['label'], stats['bought_count'], stats['count'], stats['completion_rate'],
+                    stats['total_spent'], stats['total_estimated'])
 
-        for category, stats in data['category_data'].items():
-            completion_rate = (stats['bought_count'] / stats['count'] * 100) if stats['count'] > 0 else 0
-            message += "- {}: {}/{} ({:.1f}%) - {:.2f}\n".format(category, stats['bought_count'], stats['count'], completion_rate, stats['total_spent'])
+        if 'trends' in data:
+            trends = data['trends']
+            growth = trends['totals']['growth']
+            message += "\nCompared with the previous period: {:.2f} vs {:.2f} ({})\n".format(
+                trends['totals']['current_spent'], trends['totals']['previous_spent'],
+                '{:+.1f}%'.format(growth) if growth is not None else 'n/a')
+            for label, spent, average in zip(trends['labels'], trends['current']['spent'],
+                                             trends['current']['moving_average']):
+                message += "- {}: {:.2f} (moving average {:.2f})\n".format(label, spent, average)
 
         # في التطبيق الحقيقي، يمكن إرجاع إجراء لعرض التقرير في نافذة أو صفحة ويب
         return {
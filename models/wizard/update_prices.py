@@ -14,18 +14,12 @@ class UpdatePrices(models.TransientModel):
 
     def action_update_prices(self):
         self.ensure_one()
-        domain = [('bought', '=', False)]
-        if self.category_id:
-            domain.append(('category_id', '=', self.category_id.id))
+        # تحديث جماعي لكل فئة مع سجل للتغييرات يسمح بالاسترجاع
+        run = self.env['shopping.price.update.run'].create({
+            'percentage': self.percentage,
+            'operation': self.operation,
+            'category_id': self.category_id.id,
+        })
+        run._apply()
 
-        items = self.env['shopping.item'].search(domain)
-
-        for item in items:
-            if item.estimated_price:
-                if self.operation == 'increase':
-                    new_price = item.estimated_price * (1 + self.percentage / 100)
-                else:
-                    new_price = item.estimated_price * (1 - self.percentage / 100)
-                item.estimated_price = new_price
-
-        return {'type': 'ir.actions.act_window_close'}
\ No newline at end of file
+        return {'type': 'ir.actions.act_window_close'}
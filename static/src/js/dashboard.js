@@ -17,6 +17,7 @@ var ShoppingDashboard = AbstractAction.extend({
     init: function (parent, action) {
         this._super(parent, action);
         this.data = {};
+        this.etag = null;
     },
 
     start: function () {
@@ -29,15 +30,25 @@ var ShoppingDashboard = AbstractAction.extend({
     _loadData: function () {
         var self = this;
         return rpc.query({
-            model: 'shopping.list',
-            method: 'get_dashboard_data',
+            route: '/shopping/dashboard/data',
+            params: {etag: this.etag},
         }).then(function (result) {
+            if (result.not_modified) {
+                return false;
+            }
+            self.etag = result.etag;
             self.data = result;
+            return true;
         });
     },
 
     _onRefresh: function () {
-        this._loadData().then(this._renderDashboard.bind(this));
+        var self = this;
+        this._loadData().then(function (changed) {
+            if (changed) {
+                self._renderDashboard();
+            }
+        });
     },
 
     _onNewList: function () {